@@ -2,6 +2,8 @@
 
 pip install playwright
 pip install tqdm
+pip install cryptography
+pip install lxml
 pip install langchain langchain-ollama
 playwright install
 sudo apt update
@@ -1,37 +1,40 @@
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 from getpass import getpass
-import time, os, json, re, sys, sqlite3, pytz
+import asyncio, argparse, os, pytz
+from urllib.parse import quote
 from email import policy
 from email.parser import BytesParser
-from email.utils import parsedate_to_datetime
-from datetime import datetime, timezone, timedelta
-from dateutil import parser
-from bs4 import BeautifulSoup
-
-# Prompt user for KERBEROS (username) and PASSWORD
-KERBEROS = input("Enter your KERBEROS (MIT username): ")
-EMAIL = KERBEROS + "@mit.edu"
-PASSWORD = getpass("Enter your password: ")  # Hides the input for security
+from datetime import datetime, timedelta
+from email_parsing import get_body, split_replies, strip_leading_headers
+from outlook_capture import make_response_handler
+from browser_session import load_session, save_session, clear_session
+import email_store
+import metrics
+
+OUTLOOK_URL = "https://outlook.office.com"
+
+arg_parser = argparse.ArgumentParser(description="Scrape and parse recent emails from Outlook on the web.")
+arg_parser.add_argument("--capture", action="store_true",
+                        help="read messages from Outlook's own JSON responses instead of downloading each conversation as .eml")
+arg_parser.add_argument("--record", help="with --capture, append every captured response to this JSONL file")
+arg_parser.add_argument("--base-url", default=OUTLOOK_URL,
+                        help="mail server to scrape; anything but Outlook (e.g. outlook_replay_server.py) skips the login")
+arg_parser.add_argument("--json", action="store_true",
+                        help="write parsed_emails.json for 03_fill_database.py instead of streaming into emails.db")
+args = arg_parser.parse_args()
+BASE_URL = args.base_url.rstrip("/")
+metrics.init("02_scrape")
+
 DOWNLOAD_DIR = "saved_emails"
 OUTPUT_JSON = "parsed_emails.json"
+CONCURRENCY = 4  # Number of reading pages downloading conversations in parallel
 
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
-# Connect to SQLite database
-conn = sqlite3.connect("emails.db")
+# Connect to SQLite database (creates the emails and checkpoint tables if needed)
+conn = email_store.connect()
 cursor = conn.cursor()
 
-# Create table if not exists
-cursor.execute(f'''
-    CREATE TABLE IF NOT EXISTS {"emails"} (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        subject TEXT,
-        sender TEXT,
-        date TEXT,
-        body TEXT
-    )
-''')
-
 def extract_email_data(eml_path, threshold, date_pos):
     with open(eml_path, 'rb') as file:
         msg = BytesParser(policy=policy.default).parse(file)
@@ -39,7 +42,8 @@ def extract_email_data(eml_path, threshold, date_pos):
     # Prefer 'X-Mailman-Approved-At' over 'Date'
     date_header = msg.get("X-Mailman-Approved-At")or ""
     subject = msg.get("subject", "")
-    body = get_body(msg)
+    events = []  # Calendar invite / schema.org event candidates
+    body = get_body(msg, events)
 
     # Split the body into original and replies
     split_messages = split_replies(body)
@@ -80,323 +84,254 @@ def extract_email_data(eml_path, threshold, date_pos):
         "date": segment_date,
         "body": cleaned_segment
     })
+    if events:
+        parsed_messages[-1]["events"] = events
+    if msg.get("List-Id"):
+        parsed_messages[-1]["list_id"] = str(msg.get("List-Id"))
 
     return [parsed_messages, segment_date]
 
-def strip_leading_headers(segment, subject):
-    """
-    Removes everything up to and including the Subject: ...<actual subject> part.
-    Only applies if the subject is found.
-    """
-    if not subject:
-        return segment.strip()
-    
-    # Escape special characters in subject for regex
-    escaped_subject = re.escape(subject)
-    
-    # Look for the full subject line
-    match = re.search(rf"Subject:\s*{escaped_subject}", segment)
-    if match:
-        # Remove everything up to the end of the Subject line
-        return segment[match.end():].strip()
-    
-    return segment.strip()
-
-def date_from_headers(segment):
-    """
-    Extracts and parses the datetime from a 'Sent: ...' line that is followed by 'To:'.
-    Returns an ISO formatted datetime string or None.
-    """
-    match = re.search(r"Sent:\s*(.+?)\s*To:", segment)
-    if match:
-        raw_date = match.group(1).strip()
-        try:
-            dt = parser.parse(raw_date)
-            hour_str = dt.strftime('%I').lstrip('0') or '0'
-            return f"{dt.strftime('%a')} {dt.month}/{dt.day}/{dt.year} {hour_str}:{dt.strftime('%M %p')}"
-        except Exception:
-            return None
-    return None
-
-def format_email_header_date(date_str):
-    """
-    Convert an RFC 2822 date string (e.g. 'Fri, 09 May 2025 20:00:00 +0000')
-    to the format 'Fri 5/9/2025 8:00 PM'.
-    """
-    try:
-        dt = parsedate_to_datetime(date_str)
-        hour_str = dt.strftime('%I').lstrip('0') or '0'
-        return f"{dt.strftime('%a')} {dt.month}/{dt.day}/{dt.year} {hour_str}:{dt.strftime('%M %p')}"
-    except Exception:
-        return date_str  # fallback to original if parsing fails
-
-def get_body(msg):
-    if msg.is_multipart():
-        body = ""
-        for part in msg.walk():
-            content_type = part.get_content_type()
-            content_disposition = str(part.get("Content-Disposition"))
-
-            if content_type == "text/plain" and "attachment" not in content_disposition:
-                body = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="replace")
-            if content_type == "text/html" and "attachment" not in content_disposition:
-                body = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="replace")
-                body = clean_html(body)
-                break
-        return body
-    else:
-        body = msg.get_payload(decode=True).decode(msg.get_content_charset() or "utf-8", errors="replace")
-        if "html" in msg.get_content_type().lower():
-            body = clean_html(body)
-        return body
-
-def clean_html(html_content):
-    soup = BeautifulSoup(html_content, "html.parser")
-    for script_or_style in soup(['script', 'style']):
-        script_or_style.decompose()
-    return ' '.join(soup.get_text().split())
-
-def split_replies(body):
-    # Refined reply patterns to split right before the "From: ..." section or other reply markers
-    reply_patterns = [
-        r'(?=From:.+)',  # Split right before 'From:' which usually indicates a reply
-    ]
-    
-    # Compile the regex pattern
-    pattern = re.compile("|".join(reply_patterns), flags=re.MULTILINE)
-    
-    # Split the body text where the patterns match
-    split_body = pattern.split(body)
-    
-    # Return the cleaned split body (without leading empty strings)
-    return [part.strip() for part in split_body if part.strip()]
+async def login(page):
+    # Prompt user for KERBEROS (username) and PASSWORD, only when the saved session is missing or expired
+    KERBEROS = input("Enter your KERBEROS (MIT username): ")
+    EMAIL = KERBEROS + "@mit.edu"
+    PASSWORD = getpass("Enter your password: ")  # Hides the input for security
 
+    await page.goto(f"{BASE_URL}/mail/")
 
-def extract_reply_date(text):
-    # Try to extract datetime from a line like "On Mon, Apr 1, 2024 at 5:12 PM John Doe <jdoe@example.com> wrote:"
-    match = re.search(r'^On (.+?) wrote:', text, re.MULTILINE)
-    if match:
-        raw_date = match.group(1)
-        try:
-            # Strip email addresses to improve parse accuracy
-            raw_date = re.sub(r'<.*?>', '', raw_date)
-            dt = parsedate_to_datetime(raw_date)
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            return dt.isoformat()
-        except Exception:
-            return None
-    return None
+    await page.fill('input[type="email"]', '', timeout=10000)
+    await page.type('input[type="email"]', EMAIL)
+    await page.press('input[type="email"]', 'Enter')
 
+    print("Email entered.")
 
-def parse_email_date(date_str):
-    try:
-        dt = parsedate_to_datetime(date_str)
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt
-    except Exception:
-        return None
+    await page.fill('input[name="identifier"]', '', timeout=10000)
+    await page.type('input[name="identifier"]', KERBEROS)
+    await page.press('input[name="identifier"]', 'Enter')
 
-def run():
-    # Step 0: Determine date threshold for fetching emails
-    cursor.execute("SELECT date FROM emails ORDER BY date DESC LIMIT 1")
-    result = cursor.fetchone()
+    print("Kerberos entered.")
 
-    # Get local timezone explicitly as US/Eastern
-    local_tz = pytz.timezone("US/Eastern")
+    await page.fill('input[name="credentials.passcode"]', '', timeout=10000)
+    await page.type('input[name="credentials.passcode"]', PASSWORD)
+    await page.press('input[name="credentials.passcode"]', 'Enter')
 
-    back_up = 30
+    print("Password entered.")
+    print("Please wait for Duo Push to your device...")
 
-    if result is None:
-        threshold_dt = datetime.now(local_tz) - timedelta(days=back_up)
-        print(f"First time user! Downloading from the following date: {threshold_dt.strftime("%a %-m/%-d/%Y %-I:%M %p")}")
-    else:
-        # Parse the latest date from the DB
-        latest_stored = result[0]
-        try:
-            threshold_dt = parser.parse(latest_stored)
-            if threshold_dt.tzinfo is None:
-                threshold_dt = threshold_dt.replace(tzinfo=local_tz)
-            else:
-                threshold_dt = threshold_dt.astimezone(local_tz)
-            print(f"Backing up until date of latest email: {threshold_dt.strftime("%a %-m/%-d/%Y %-I:%M %p")}")
-        except Exception:
-            print("Could not parse latest stored date..")
-            threshold_dt = datetime.now(local_tz) - timedelta(days=back_up)
-
-    # Format threshold_dt to "Fri 5/10/2025 11:14 PM"
-    threshold_dt = threshold_dt.strftime("%a %-m/%-d/%Y %-I:%M %p")
+    try:
+        await page.click('#trust-browser-button', timeout=60000)
+        print("Clicked 'Yes, this is my device'")
+    except:
+        print("No 'Is this your device' prompt found — continuing")
 
-    all_emails = []
+    await page.wait_for_url(f"{BASE_URL}/mail/*", timeout=60000)
+    print("Login successful!")
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
-        page = context.new_page()
-        page.goto("https://outlook.office.com/mail/")
+async def open_menu_item(page, opener, item):
+    # Menus sometimes close before the item renders; reopen once before giving up
+    try:
+        await page.click(item, timeout=5000)
+    except:
+        await page.click(opener, timeout=5000)
+        await page.click(item, timeout=5000)
+
+async def download_conversation(page, cid):
+    """Opens a conversation by id in its own page and saves it as .eml. Returns (filepath, dom_date)."""
+    await page.goto(f"{BASE_URL}/mail/inbox/id/{quote(cid, safe='')}", wait_until="domcontentloaded")
+
+    # Clicks auto-wait for the reading pane instead of sleeping a fixed time
+    await page.click('button[aria-label="More actions"]', timeout=15000)
+    await open_menu_item(page, 'button[aria-label="More actions"]', 'button[aria-label="Download"]')
+
+    async with page.expect_download(timeout=15000) as download_info:
+        await open_menu_item(page, 'button[aria-label="Download"]', 'button[aria-label="Download as EML"]')
+
+    download = await download_info.value
+    filepath = f"{DOWNLOAD_DIR}/{cid}.eml"
+    await download.save_as(filepath)
+
+    # Get visible date from page
+    dom_date = await page.locator('[data-testid="SentReceivedSavedTime"]').all_text_contents()
+    return filepath, dom_date
+
+async def download_worker(context, queue, state, threshold_dt):
+    page = await context.new_page()
+    while True:
+        cid = await queue.get()
+        if cid is None:
+            break
+        if state["reached_threshold"]:
+            continue
 
-        # Step 1: Login
-        page.wait_for_selector('input[type="email"]', timeout=10000)
-        page.fill('input[type="email"]', '')
-        page.type('input[type="email"]', EMAIL)
-        page.press('input[type="email"]', 'Enter')
+        try:
+            with metrics.span("download"):
+                filepath, dom_date = await download_conversation(page, cid)
+        except Exception:
+            metrics.count("download_errors")
+            print(f"Error with download, skipping email {cid}.")
+            continue
 
-        print("Email entered.")
+        try:
+            with metrics.span("parse"):
+                parsed_segments = await asyncio.to_thread(extract_email_data, filepath, threshold_dt, dom_date)
+        except Exception:
+            metrics.count("parse_errors")
+            print(f"Could not parse email {cid}, skipping.")
+            continue
+        finally:
+            os.remove(filepath)
+
+        if not parsed_segments[0]:
+            # The inbox is sorted newest first, so everything after this is older too
+            state["reached_threshold"] = True
+            continue
+        if parsed_segments[0] == [0]:
+            state["writer"].mark_processed(cid)
+        else:
+            for email in parsed_segments[0]:
+                state["writer"].add(email, cid)
+            metrics.count("emails_scraped", len(parsed_segments[0]))
+
+        state["downloaded_count"] += 1
+        recent_date = parsed_segments[1] or ""
+        print(f"Saved and parsed {state['downloaded_count']} emails. Most recent download date: {recent_date}. Downloading until: {threshold_dt}")
+    await page.close()
+
+async def scroll_inbox(page, state, on_new_cid):
+    """Hands every unseen conversation id to on_new_cid, scrolling until the threshold or the end of the inbox."""
+    seen_ids = set(state["processed_ids"])
+    stalled = 0
+
+    while not state["reached_threshold"]:
+        rows = await page.query_selector_all('[data-convid]')
+        cids = [await row.get_attribute("data-convid") for row in rows]
+
+        for cid in cids:
+            if not cid or cid in seen_ids:
+                continue
+            seen_ids.add(cid)
+            await on_new_cid(cid)
+            if state["reached_threshold"]:
+                return
+
+        # Scroll the last row into view and wait for the list to render further rows
+        last_cid = cids[-1] if cids else None
+        if rows:
+            await rows[-1].scroll_into_view_if_needed()
+        try:
+            await page.wait_for_function(
+                """last => {
+                    const rows = document.querySelectorAll('[data-convid]');
+                    return rows.length && rows[rows.length - 1].getAttribute('data-convid') !== last;
+                }""",
+                arg=last_cid, timeout=10000)
+            stalled = 0
+        except Exception:
+            # Nothing new rendered twice in a row: end of the mailbox
+            stalled += 1
+            if stalled > 1:
+                return
+
+async def open_for_capture(page, cid, state):
+    # Selecting a row makes Outlook fetch the conversation; the response handler parses it
+    if cid in state["captured_ids"]:
+        return
+    try:
+        async with page.expect_response(lambda r: "json" in (r.headers.get("content-type") or ""), timeout=10000):
+            await page.click(f'[data-convid="{cid}"]', timeout=5000)
+    except Exception:
+        print(f"No response captured for email {cid}, skipping.")
 
-        page.wait_for_selector('input[name="identifier"]', timeout=10000)
-        page.fill('input[name="identifier"]', '')
-        page.type('input[name="identifier"]', KERBEROS)
-        page.press('input[name="identifier"]', 'Enter')
+def latest_threshold(local_tz):
+    # Step 0: Determine date threshold for fetching emails (indexed MAX over received_at)
+    latest_stored = email_store.latest_received_at(conn)
 
-        print("Kerberos entered.")
+    back_up = 30
 
-        page.wait_for_selector('input[name="credentials.passcode"]', timeout=10000)
-        page.fill('input[name="credentials.passcode"]', '')
-        page.type('input[name="credentials.passcode"]', PASSWORD)
-        page.press('input[name="credentials.passcode"]', 'Enter')
+    if latest_stored is None:
+        threshold_dt = datetime.now(local_tz) - timedelta(days=back_up)
+        print(f"First time user! Downloading from the following date: {threshold_dt.strftime('%a %-m/%-d/%Y %-I:%M %p')}")
+    else:
+        threshold_dt = latest_stored.astimezone(local_tz)
+        print(f"Backing up until date of latest email: {threshold_dt.strftime('%a %-m/%-d/%Y %-I:%M %p')}")
 
-        print("Password entered.")
-        print("Please wait for Duo Push to your device...")
+    # Format threshold_dt to "Fri 5/10/2025 11:14 PM"
+    return threshold_dt.strftime("%a %-m/%-d/%Y %-I:%M %p")
 
-        try:
-            page.wait_for_selector('#trust-browser-button', timeout=60000)
-            page.click('#trust-browser-button')
-            print("Clicked 'Yes, this is my device'")
-        except:
-            print("No 'Is this your device' prompt found — continuing")
+async def run():
+    # Get local timezone explicitly as US/Eastern
+    local_tz = pytz.timezone("US/Eastern")
 
-        page.wait_for_url("https://outlook.office.com/mail/*", timeout=60000)
-        print("Login successful!")
+    # Resume an interrupted run with its original threshold, or start a new one
+    resumed = None if args.json else email_store.unfinished_run(conn)
+    if resumed:
+        run_id, threshold_dt = resumed
+        print(f"Resuming interrupted run, downloading until: {threshold_dt}")
+    else:
+        threshold_dt = latest_threshold(local_tz)
+        run_id = None if args.json else email_store.start_run(conn, threshold_dt)
 
-        # Step 2: Scroll and extract messages
-        seen_ids = set()
-        downloaded_count = 0
-        max_scrolls = 100000
+    if args.json:
+        writer = email_store.JsonEmailWriter(OUTPUT_JSON)
+        processed_ids = set()
+    else:
+        # Parsed emails go straight into emails.db in batches, checkpointed by conversation id
+        writer = email_store.EmailWriter(conn, run_id)
+        processed_ids = email_store.processed_conversation_ids(conn, run_id)
+
+    state = {"writer": writer, "downloaded_count": 0, "reached_threshold": False,
+             "processed_ids": processed_ids, "captured_ids": set(processed_ids)}
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        use_login = BASE_URL == OUTLOOK_URL
+        context = await browser.new_context(accept_downloads=True, storage_state=load_session() if use_login else None)
+        page = await context.new_page()
+        if args.capture:
+            threshold_aware = local_tz.localize(datetime.strptime(threshold_dt, "%a %m/%d/%Y %I:%M %p"))
+            page.on("response", make_response_handler(state, threshold_aware, args.record))
+
+        # Step 1: Reuse the saved session if it still lands on the inbox, otherwise log in
+        await page.goto(f"{BASE_URL}/mail/")
+        if use_login:
+            landed = await page.wait_for_selector('[data-convid], input[type="email"]', timeout=60000)
+            if await landed.get_attribute("data-convid") is None:
+                print("Saved session missing or expired, logging in.")
+                # Don't offer the expired session again if this login is abandoned or fails
+                clear_session()
+                with metrics.span("login"):  # Includes waiting for the Duo push
+                    await login(page)
+            else:
+                print("Reused saved session, skipping login.")
+            save_session(await context.storage_state())
 
         print("Waiting for inbox to load...")
-        page.wait_for_selector('[data-convid]', timeout=60000)
+        with metrics.span("inbox_load"):
+            await page.wait_for_selector('[data-convid]', timeout=60000)
         print("Inbox loaded.")
 
-        
-        reached_threshold = False
-
-        for _ in range(max_scrolls):
-            emails = page.query_selector_all('[data-convid]')
-            #print("emails grabbed: " + str(len(emails)))
-            total_skipped = 0
-
-            refreshed = 0
-            for email in emails:
-                cid = email.get_attribute("data-convid")
-                if not cid or cid in seen_ids:
-                    total_skipped += 1
-                    if total_skipped == len(emails):
-                        if refreshed == 0:
-                            #page.screenshot(path="refresh0.png", full_page=True)
-                            refreshed += 1
-                        else:
-                            #page.screenshot(path="refresh1.png", full_page=True)
-                            reached_threshold = True
-                    continue
-
-                seen_ids.add(cid)
-
-                
-                email_fresh = page.query_selector(f'[data-convid="{cid}"]')
-                if not email_fresh:
-                    print(f"Skipping email {cid} (element no longer in DOM)")
-                    continue
-
-                email_fresh.click()
-                page.wait_for_timeout(2000)
-
-                #page.screenshot(path="more_actions.png", full_page=True)
-                try:
-                    page.wait_for_selector('button[aria-label="More actions"]', timeout=5000)
-                    page.click('button[aria-label="More actions"]')
-                except:
-                    print("Error with download, skipping email.")
-                    continue
-
-                #page.screenshot(path="download.png", full_page=True)
-                
-                try:
-                    page.wait_for_selector('button[aria-label="Download"]', timeout=5000)
-                    page.click('button[aria-label="Download"]')
-                except:
-                    try:
-                        page.click('button[aria-label="More actions"]')
-                        page.wait_for_selector('button[aria-label="Download"]', timeout=5000)
-                        page.click('button[aria-label="Download"]')
-                    except:
-                        print("Error with download, skipping email.")
-                        continue
-
-                with page.expect_download() as download_info:
-                    #page.screenshot(path="failure.png", full_page=True)
-                    try:
-                        page.wait_for_selector('button[aria-label="Download as EML"]', timeout=5000)
-                        page.click('button[aria-label="Download as EML"]')
-                    except:
-                        try:
-                            page.click('button[aria-label="Download"]')
-                            page.wait_for_selector('button[aria-label="Download as EML"]', timeout=5000)
-                            page.click('button[aria-label="Download as EML"]')
-                        except:
-                            print("Error with download, skipping email.")
-                            continue
-                    
-
-                download = download_info.value
-                filepath = f"{DOWNLOAD_DIR}/{cid}.eml"
-                download.save_as(filepath)
-
-                # Get visible date from page
-                elements = page.locator('[data-testid="SentReceivedSavedTime"]')
-                count = elements.count()
-                if count > 1:
-                    dom_date = [elements.all()[i].text_content(timeout=5000) for i in range(count)]
-                else:
-                    dom_date = [elements.text_content(timeout=5000)]
-
-                #print(dom_date)
-
-                parsed_segments = extract_email_data(filepath, threshold_dt, dom_date)
-
-                if parsed_segments[0]:
-                    if parsed_segments[0] != [0]:
-                        all_emails.extend(parsed_segments[0])
-                else:
-                    reached_threshold = True
-                    # Delete .eml file
-                    os.remove(filepath)
-                    break
-
-                os.remove(filepath)
-                downloaded_count += 1
-                recent_date = ""
-                if parsed_segments[1]:
-                    recent_date = parsed_segments[1]
-                print(f"Saved and parsed {downloaded_count} emails. Most recent download date: {recent_date}. Downloading until: {threshold_dt}")
-
-            if reached_threshold:
-                break
-
-            page.keyboard.press("PageDown")
-            time.sleep(1)
-
-        print(f"Finished downloading and parsing {downloaded_count} emails.")
-        browser.close()
-
-    # Sort emails by date, most recent first
-    all_emails.sort(
-        key=lambda email: parse_email_date(email.get("date")) or datetime(1970, 1, 1, tzinfo=timezone.utc),
-        reverse=True
-    )
-
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        json.dump(all_emails, f, indent=4, ensure_ascii=False)
-    print(f"📄 Saved all parsed emails to {OUTPUT_JSON}")
-
-run()
+        if args.capture:
+            # Step 2: Scroll the inbox list, reading messages from the responses it triggers
+            await scroll_inbox(page, state, lambda cid: open_for_capture(page, cid, state))
+        else:
+            # Step 2: Scroll the inbox list and download conversations in parallel pages
+            queue = asyncio.Queue(maxsize=CONCURRENCY * 2)
+            workers = [asyncio.create_task(download_worker(context, queue, state, threshold_dt)) for _ in range(CONCURRENCY)]
+
+            # queue.put blocks while the workers are busy, so scrolling never runs far ahead of downloads
+            await scroll_inbox(page, state, queue.put)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+        print(f"Finished downloading and parsing {state['downloaded_count']} emails.")
+        await browser.close()
+
+    writer.close()
+    if args.json:
+        print(f"📄 Saved all parsed emails to {OUTPUT_JSON}")
+    else:
+        email_store.finish_run(conn, run_id)
+        print(f"Inserted {writer.inserted} entries into 'emails.db' in table 'emails' ({writer.count - writer.inserted} already stored).")
+
+asyncio.run(run())
@@ -0,0 +1,92 @@
+import os, sys, argparse, mailbox
+from email import policy
+from email.parser import BytesParser
+from datetime import datetime
+from multiprocessing import Pool
+from dateutil import parser
+from email_parsing import parse_message
+from email_store import LOCAL_TZ, DATE_FORMAT
+import email_store
+import metrics
+
+# Offline alternative to 02_extract_parse_emails.py: parses a directory of .eml
+# files, an mbox file or a Maildir export (e.g. from Outlook / Thunderbird / Google Takeout)
+# across a process pool and writes the same parsed_emails.json that 03_fill_database.py reads,
+# or with --db streams the parsed emails straight into emails.db.
+
+OUTPUT_JSON = "parsed_emails.json"
+
+def iter_sources(paths):
+    """Yields either .eml file paths or raw message bytes for every message found under paths."""
+    for path in paths:
+        if os.path.isdir(path) and all(os.path.isdir(os.path.join(path, d)) for d in ("cur", "new", "tmp")):
+            box = mailbox.Maildir(path, factory=None, create=False)
+            for key in box.iterkeys():
+                yield box.get_bytes(key)
+        elif os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(".eml"):
+                        yield os.path.join(root, name)
+        elif path.lower().endswith(".eml"):
+            yield path
+        else:
+            box = mailbox.mbox(path, factory=None, create=False)
+            for key in box.iterkeys():
+                yield box.get_bytes(key)
+
+def parse_source(source):
+    # Runs in a worker process
+    try:
+        if isinstance(source, str):
+            with open(source, 'rb') as file:
+                msg = BytesParser(policy=policy.default).parse(file)
+        else:
+            msg = BytesParser(policy=policy.default).parsebytes(source)
+        return parse_message(msg)
+    except Exception as e:
+        print(f"Skipping unparseable message: {e}", file=sys.stderr)
+        return None
+
+def ingest(paths, writer, since=None, workers=None, chunksize=16):
+    """Parses every message under paths in parallel into writer; keeps only messages newer than since."""
+    with Pool(processes=workers) as pool:
+        for item in pool.imap_unordered(parse_source, iter_sources(paths), chunksize=chunksize):
+            if item is None:
+                metrics.count("messages_skipped")
+                continue
+            if since is not None and datetime.strptime(item["date"], DATE_FORMAT) <= since:
+                continue
+            writer.add(item)
+            metrics.count("emails_parsed")
+    writer.close()
+    return writer.count
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Parse local .eml / mbox / Maildir exports into parsed_emails.json.")
+    arg_parser.add_argument("paths", nargs="+", help=".eml files, directories of .eml files, mbox files or Maildir directories")
+    arg_parser.add_argument("--since", help="only keep emails after this date (e.g. 'Fri 5/10/2025 11:14 PM' or '2025-05-10')")
+    arg_parser.add_argument("--workers", type=int, default=None, help="number of parser processes (default: CPU count)")
+    arg_parser.add_argument("--output", default=OUTPUT_JSON)
+    arg_parser.add_argument("--db", help="stream parsed emails into this database (e.g. emails.db) instead of writing --output")
+    args = arg_parser.parse_args()
+
+    metrics.init("02b_ingest", args.db or "emails.db")
+    since = None
+    if args.since:
+        # Compare in local time, matching the Outlook-style dates in the output
+        since = parser.parse(args.since)
+        if since.tzinfo is not None:
+            since = since.astimezone(LOCAL_TZ)
+        since = since.replace(tzinfo=None)
+
+    if args.db:
+        writer = email_store.EmailWriter(email_store.connect(args.db))
+        count = ingest(args.paths, writer, since=since, workers=args.workers)
+        print(f"Inserted {writer.inserted} entries into '{args.db}' in table 'emails' ({count - writer.inserted} already stored).")
+    else:
+        count = ingest(args.paths, email_store.JsonEmailWriter(args.output), since=since, workers=args.workers)
+        print(f"📄 Saved {count} parsed emails to {args.output}")
+
+if __name__ == "__main__":
+    main()
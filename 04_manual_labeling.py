@@ -1,36 +1,17 @@
-import sqlite3
-import os
-
-DB_NAME = "emails_labeled.db"
-
-def setup_db():
-    # Ensure copy exists
-    if not os.path.exists(DB_NAME):
-        import shutil
-        shutil.copy("emails.db", DB_NAME)
-        print(f"Copied 'emails.db' → '{DB_NAME}'")
-
-    # Add is_event column if it doesn't exist
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("ALTER TABLE emails ADD COLUMN is_event INTEGER;")
-        conn.commit()
-    except sqlite3.OperationalError:
-        # Column probably already exists
-        pass
-    conn.close()
+import email_store
 
 def label_emails():
-    conn = sqlite3.connect(DB_NAME)
+    # Labels live in their own table of emails.db, keyed by email id
+    conn = email_store.connect()
     cursor = conn.cursor()
 
     # Select 270 earliest emails by date that haven't been labeled
     cursor.execute("""
-        SELECT id, subject, sender, date, body 
-        FROM emails 
-        WHERE is_event IS NULL 
-        ORDER BY datetime(date) ASC 
+        SELECT e.id, e.subject, e.sender, e.date, e.body
+        FROM emails e
+        LEFT JOIN labels l ON l.email_id = e.id
+        WHERE l.email_id IS NULL
+        ORDER BY e.received_at ASC
         LIMIT 270;
     """)
     rows = cursor.fetchall()
@@ -49,8 +30,7 @@ def label_emails():
         while True:
             label = input("Is this about an upcoming event? [1 = Yes, 0 = No, s = skip, q = quit] ").strip().lower()
             if label in {"1", "0"}:
-                cursor.execute("UPDATE emails SET is_event = ? WHERE id = ?", (int(label), id_))
-                conn.commit()
+                email_store.save_label(conn, id_, int(label))
                 break
             elif label == "s":
                 break
@@ -67,5 +47,4 @@ def label_emails():
     print("Finished labeling 270 earliest emails.")
 
 if __name__ == "__main__":
-    setup_db()
     label_emails()
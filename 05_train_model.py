@@ -1,15 +1,22 @@
-import sqlite3
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import make_pipeline
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
+from sklearn.metrics import classification_report, f1_score
 import joblib
+import hashlib
+import email_store
+import compact_model
+import metrics
+
+metrics.init("05_train")
 
 def load_labeled_data():
-    conn = sqlite3.connect("emails_labeled.db")
-    df = pd.read_sql_query("SELECT subject, body, is_event FROM emails WHERE is_event IS NOT NULL", conn)
+    conn = email_store.connect()
+    df = pd.read_sql_query("""
+        SELECT e.id, e.subject, e.body, l.is_event
+        FROM labels l JOIN emails e ON e.id = l.email_id
+    """, conn)
     conn.close()
     return df
 
@@ -18,8 +25,10 @@ df = load_labeled_data()
 X = df['subject'] + " " + df['body']
 y = df['is_event']
 
-# Split into train/test
-X_train, X_test, y_train, y_test = train_test_split(X, y, stratify=y)
+# Split into train/test: the test set is the fixed holdout 05b scores every model version on,
+# so this model is never trained on the labels that decide whether an incremental one replaces it
+holdout = df['id'].map(email_store.in_holdout)
+X_train, X_test, y_train, y_test = X[~holdout], X[holdout], y[~holdout], y[holdout]
 
 # Create model pipeline with class_weight balanced
 model = make_pipeline(
@@ -28,7 +37,9 @@ model = make_pipeline(
 )
 
 # Train and evaluate
-model.fit(X_train, y_train)
+with metrics.span("fit"):
+    model.fit(X_train, y_train)
+metrics.count("labels_trained", len(X_train))
 print(classification_report(y_test, model.predict(X_test)))
 
 '''
@@ -45,4 +56,17 @@ weighted avg       0.96      0.96      0.96        68
 
 # Save model
 joblib.dump(model, "event_classifier.pkl")
-print("Model saved as 'event_classifier.pkl'")
\ No newline at end of file
+print("Model saved as 'event_classifier.pkl'")
+
+# Also export the memory-mappable arrays 06 loads instead of the pickle
+with open("event_classifier.pkl", "rb") as f:
+    version = hashlib.sha1(f.read()).hexdigest()[:12]
+compact_model.export(model, version)
+print(f"Compact model saved to '{compact_model.COMPACT_DIR}'")
+
+conn = email_store.connect()
+email_store.record_model_version(conn, version, "full", "event_classifier.pkl",
+                                 trained_labels=len(X_train), events_seen=int(y_train.sum()),
+                                 holdout_size=len(X_test), holdout_f1=f1_score(y_test, model.predict(X_test), zero_division=0),
+                                 promoted=1)
+conn.close()
\ No newline at end of file
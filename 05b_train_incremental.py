@@ -0,0 +1,142 @@
+import os
+import shutil
+import hashlib
+import argparse
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.metrics import f1_score
+import email_store
+import metrics
+
+# Incremental alternative to 05_train_model.py: a stateless HashingVectorizer and an
+# SGDClassifier trained with partial_fit, so each run folds in only the labels added
+# (by 04_manual_labeling.py) since the last checkpoint, in fixed-size chunks.
+# Every checkpoint is kept in models/ and recorded in the model_versions table. A new
+# version only replaces event_classifier.pkl if its F1 on a fixed holdout (labels never
+# trained on) is at least that of the current model, minus --tolerance.
+
+MODEL_PATH = "event_classifier.pkl"
+MODELS_DIR = "models"
+N_FEATURES = 2 ** 18
+CHUNK_SIZE = 256
+TOLERANCE = 0.02
+MIN_HOLDOUT = 20  # Fewer holdout labels than this can't judge a model; promote anyway
+
+def file_version(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+def new_pipeline():
+    return make_pipeline(
+        HashingVectorizer(n_features=N_FEATURES, alternate_sign=False),
+        SGDClassifier(loss="log_loss", alpha=1e-5, random_state=0)
+    )
+
+def latest_checkpoint(conn):
+    """(pipeline, last label seq, labels trained on, events seen) of the newest incremental version, or None."""
+    row = conn.execute('''
+        SELECT path, last_label_seq, trained_labels, events_seen FROM model_versions
+        WHERE kind = 'incremental' ORDER BY created_at DESC, rowid DESC LIMIT 1
+    ''').fetchone()
+    if row is None or not os.path.exists(row[0]):
+        return None
+    return (joblib.load(row[0]),) + tuple(row[1:])
+
+def load_labels(conn, after_seq):
+    return conn.execute('''
+        SELECT l.email_id, e.subject, e.body, l.is_event, l.seq
+        FROM labels l JOIN emails e ON e.id = l.email_id
+        WHERE l.seq > ?
+        ORDER BY l.seq
+    ''', (after_seq,)).fetchall()
+
+def holdout_f1(pipeline, holdout):
+    if pipeline is None or not holdout:
+        return None
+    texts = [(subject or "") + " " + (body or "") for _, subject, body, _, _ in holdout]
+    return f1_score([row[3] for row in holdout], pipeline.predict(texts), zero_division=0)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Fold new labels into the event classifier incrementally.")
+    arg_parser.add_argument("--full", action="store_true", help="start over from the first label instead of the last checkpoint")
+    arg_parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                            help="how much lower than the current model's holdout F1 a new version may score and still replace it")
+    arg_parser.add_argument("--force", action="store_true", help="replace event_classifier.pkl regardless of the holdout")
+    args = arg_parser.parse_args()
+    metrics.init("05b_train")
+
+    conn = email_store.connect()
+    checkpoint = None if args.full else latest_checkpoint(conn)
+    if checkpoint:
+        pipeline, last_seq, trained, events_seen = checkpoint
+    else:
+        pipeline, last_seq, trained, events_seen = new_pipeline(), 0, 0, 0
+
+    rows = load_labels(conn, last_seq)
+    if not rows:
+        print("No new labels since the last checkpoint.")
+        conn.close()
+        return
+    new = [row for row in rows if not email_store.in_holdout(row[0])]
+    if not new and not checkpoint:
+        # partial_fit never ran, so there is no model to save or score
+        print(f"All {len(rows)} labels are in the holdout; label more emails before training.")
+        conn.close()
+        return
+
+    # Fold in the new labels a chunk at a time; memory stays flat however many labels exist
+    for start in range(0, len(new), CHUNK_SIZE):
+        chunk = new[start:start + CHUNK_SIZE]
+        texts = [(subject or "") + " " + (body or "") for _, subject, body, _, _ in chunk]
+        y = np.array([row[3] for row in chunk])
+        trained += len(chunk)
+        events_seen += int(y.sum())
+
+        # Same effect as class_weight='balanced', from the class counts seen so far
+        weights = {1: trained / (2 * max(events_seen, 1)), 0: trained / (2 * max(trained - events_seen, 1))}
+        vectorizer, classifier = pipeline.steps[0][1], pipeline.steps[-1][1]
+        with metrics.span("partial_fit"):
+            classifier.partial_fit(vectorizer.transform(texts), y, classes=[0, 1],
+                                   sample_weight=np.array([weights[label] for label in y]))
+        metrics.count("labels_trained", len(chunk))
+    last_seq = rows[-1][4]
+
+    # Save the checkpoint under its content hash, the same version 06 will report
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    temp_path = os.path.join(MODELS_DIR, "incremental-new.pkl")
+    joblib.dump(pipeline, temp_path)
+    version = file_version(temp_path)
+    path = os.path.join(MODELS_DIR, f"incremental-{version}.pkl")
+    os.replace(temp_path, path)
+
+    # Quality gate on every holdout label, old and new
+    holdout = [row for row in load_labels(conn, 0) if email_store.in_holdout(row[0])]
+    new_f1 = holdout_f1(pipeline, holdout)
+    current = joblib.load(MODEL_PATH) if os.path.exists(MODEL_PATH) else None
+    current_f1 = holdout_f1(current, holdout)
+    promote = (args.force or current_f1 is None or len(holdout) < MIN_HOLDOUT
+               or new_f1 >= current_f1 - args.tolerance)
+    if promote:
+        shutil.copyfile(path, MODEL_PATH)
+
+    email_store.record_model_version(conn, version, "incremental", path,
+                                     last_label_seq=last_seq, trained_labels=trained, events_seen=events_seen,
+                                     holdout_size=len(holdout), holdout_f1=new_f1, baseline_f1=current_f1,
+                                     promoted=int(promote))
+    conn.close()
+
+    print(f"Folded {len(new)} new labels into model {version} ({trained} labels in total, "
+          f"{len(rows) - len(new)} new ones held out).")
+    scores = f"holdout F1 {new_f1:.3f}" if new_f1 is not None else "no holdout"
+    if current_f1 is not None:
+        scores += f" vs {current_f1:.3f} for the current model, on {len(holdout)} labels"
+    if promote:
+        print(f"{scores}: saved as '{MODEL_PATH}'.")
+    else:
+        print(f"{scores}: kept the current '{MODEL_PATH}' (checkpoint saved as '{path}').")
+
+if __name__ == "__main__":
+    main()
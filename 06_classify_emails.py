@@ -1,56 +1,126 @@
-import sqlite3
-import pandas as pd
+import hashlib
+import argparse
 import joblib
+import email_store
+import compact_model
+import metrics
+from verdict_cache import VerdictCache, LEVELS, MIN_COUNT, CONFIDENCE
 
-def load_unlabeled_emails():
-    conn = sqlite3.connect("emails.db")
-    df = pd.read_sql_query("SELECT subject, sender, date, body FROM emails", conn)
-    conn.close()
-    return df
-
-def save_events_to_new_db(events_df):
-    conn = sqlite3.connect("emails_events.db")
-    cursor = conn.cursor()
-
-    # Create table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS emails (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            subject TEXT,
-            sender TEXT,
-            date TEXT,
-            body TEXT
-        )
-    ''')
-
-    # Insert rows without specifying id (let SQLite auto-increment)
-    for _, row in events_df.iterrows():
-        cursor.execute('''
-            INSERT INTO emails (subject, sender, date, body)
+MODEL_PATH = "event_classifier.pkl"
+CHUNK_SIZE = 500
+
+def model_version(path=MODEL_PATH):
+    # Content hash, so retraining (05) changes the version even if the file name doesn't
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+def load_model(path=MODEL_PATH):
+    """(version, model): the compact arrays exported with this pickle if present, else the pickle itself."""
+    version = model_version(path)
+    model = compact_model.load(version=version)
+    if model is None:
+        model = joblib.load(path)
+    return version, model
+
+def load_unscored_emails(conn, version, after_id, rescore=False):
+    """Next chunk of emails with no prediction (or, with rescore, one from another model version)."""
+    stale = "OR p.model_version IS NOT ?" if rescore else ""
+    params = (after_id, version, CHUNK_SIZE) if rescore else (after_id, CHUNK_SIZE)
+    return conn.execute(f'''
+        SELECT e.id, e.subject, e.body, e.sender, e.list_id
+        FROM emails e
+        LEFT JOIN predictions p ON p.email_id = e.id
+        WHERE e.id > ? AND (p.email_id IS NULL {stale})
+        ORDER BY e.id
+        LIMIT ?
+    ''', params).fetchall()
+
+def save_predictions(conn, ids, predictions, version, sources):
+    with conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO predictions (email_id, is_event, model_version, source)
             VALUES (?, ?, ?, ?)
-        ''', (row['subject'], row['sender'], row['date'], row['body']))
+        ''', [(id_, int(is_event), version, source) for id_, is_event, source in zip(ids, predictions, sources)])
 
-    conn.commit()
-    conn.close()
+def classify_pending(conn, model, version, verdicts=None, rescore=False):
+    """
+    Scores every email without a prediction (with rescore, also those from another model version):
+    cascade verdicts first, the model for the rest. Returns (scored, events, {level: count}).
+    """
+    scored = events = 0
+    last_id = 0
+    decided = {level: 0 for level in LEVELS + ["model"]}
+
+    # Only emails not yet scored, streamed in fixed-size chunks by id
+    while True:
+        rows = load_unscored_emails(conn, version, last_id, rescore)
+        if not rows:
+            break
+        ids, predictions, sources = [], [], []
+        uncertain = []
+        for id_, subject, body, sender, list_id in rows:
+            verdict = verdicts.verdict(sender, list_id, subject) if verdicts else None
+            if verdict is None:
+                uncertain.append((id_, subject, body))
+                continue
+            level, is_event = verdict
+            ids.append(id_)
+            predictions.append(is_event)
+            sources.append(level)
+            decided[level] += 1
+
+        if uncertain:
+            X = [(subject or "") + " " + (body or "") for _, subject, body in uncertain]
+
+            # Predict
+            ids += [id_ for id_, _, _ in uncertain]
+            with metrics.span("classifier_batch"):
+                predictions += [int(is_event) for is_event in model.predict(X)]
+            sources += ["model"] * len(uncertain)
+            decided["model"] += len(uncertain)
+
+        with metrics.span("db_write"):
+            save_predictions(conn, ids, predictions, version, sources)
+        scored += len(ids)
+        events += int(sum(predictions))
+        last_id = rows[-1][0]
+
+    metrics.count("emails_scored", scored)
+    metrics.count("events_predicted", events)
+    for level, count in decided.items():
+        metrics.count(f"decided_by_{level}", count)
+    return scored, events, decided
 
 def main():
-    # Load trained model
-    model = joblib.load("event_classifier.pkl")
+    arg_parser = argparse.ArgumentParser(description="Classify new emails as events.")
+    arg_parser.add_argument("--rescore", action="store_true",
+                            help="also re-score emails predicted by a different model version")
+    arg_parser.add_argument("--no-cascade", action="store_true",
+                            help="run the model on every email instead of trusting confident list/sender verdicts first")
+    arg_parser.add_argument("--min-count", type=int, default=MIN_COUNT,
+                            help="emails needed from a list or sender before its verdict is trusted")
+    arg_parser.add_argument("--confidence", type=float, default=CONFIDENCE,
+                            help="smoothed event (or non-event) rate a list or sender needs to decide on its own")
+    args = arg_parser.parse_args()
+    metrics.init("06_classify")
 
-    # Load unlabeled emails
-    df = load_unlabeled_emails()
-    X = df['subject'] + " " + df['body']
+    with metrics.span("model_load"):
+        version, model = load_model()
 
-    # Predict
-    predictions = model.predict(X)
+    conn = email_store.connect()
 
-    # Filter for events
-    df['is_event'] = predictions
-    events_df = df[df['is_event'] == 1].drop(columns='is_event')
+    # Cascade: confident per-list / per-sender verdicts first, the model only for the rest
+    verdicts = None
+    if not args.no_cascade:
+        verdicts = VerdictCache(conn, args.min_count, args.confidence)
+        verdicts.rebuild()
+    scored, events, decided = classify_pending(conn, model, version, verdicts, args.rescore)
 
-    # Save to new database
-    save_events_to_new_db(events_df)
-    print(f"Exported {len(events_df)} emails classified as events to 'emails_events.db'.")
+    conn.close()
+    print(f"Classified {scored} new emails, {events} as events, into table 'predictions' (model {version}).")
+    if scored:
+        shares = ", ".join(f"{level} {count} ({100 * count / scored:.0f}%)" for level, count in decided.items())
+        print(f"Decided by: {shares}")
 
 if __name__ == "__main__":
     main()
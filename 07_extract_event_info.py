@@ -1,14 +1,47 @@
-import sqlite3
 import json
+import sys
 import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from tqdm import tqdm
 from langchain_ollama import OllamaLLM
+import email_store
+import metrics
+from llm_cache import LLMCache, cache_key
+from prompt_compaction import compact_body, estimate_tokens, TOKEN_BUDGET
+from rule_extraction import resolve, FIELDS
+from json_stream import first_json_value, stream_json
+from near_duplicates import NearDuplicateIndex
+from ollama_service import MODEL
 
-# Initialize Ollama model once (adjust model name if needed)
-model = OllamaLLM(model="llama3.2:1b")
+# Initialize Ollama model once (adjust MODEL in ollama_service.py if needed; 08 warms the same one)
+model = OllamaLLM(model=MODEL)
+# Same model in Ollama's JSON mode, for single-email prompts that must answer with one object
+json_model = OllamaLLM(model=MODEL, format="json")
 
-# Prompt template for Ollama
-def build_prompt(subject, body):
+CONCURRENCY = 4
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 1
+PROMPT_VERSION = 3  # Bump whenever build_prompt changes, so cached answers are not reused
+
+# Batched mode (--batch): short emails share one prompt
+SHORT_EMAIL_TOKENS = 250     # Longer bodies always get their own prompt
+BATCH_TOKEN_BUDGET = 1500    # Total body tokens per batched prompt
+MAX_BATCH_SIZE = 8
+TARGET_BATCH_SECONDS = 30    # Shrink batches that take longer than this
+
+FIELD_INSTRUCTIONS = {
+    "event_name": '[A short name or title of the event, if provided. Otherwise "unknown"]',
+    "description": '[A brief summary of what the event is about, ideally 1-2 sentences.]',
+    "location": '[The venue, building, room, or address where the event will take place. If online, say so. If not mentioned, write "unknown"]',
+    "date": '[The date and time of the event in natural language (e.g., "Thursday at 6pm"). If not specified, write "unknown"]',
+    "registration_required": '["yes" if the email says you must register or RSVP before attending, "no" if not required, or "unknown" if unclear]',
+    "food_provided": '[Mention the food being offered (e.g., "pizza", "light snacks", "catered dinner"). If no food will be provided, write "none". If the email doesn’t say, write "unknown"]',
+}
+
+# Prompt template for Ollama; fields narrows it to the keys the rules couldn't fill
+def build_prompt(subject, body, fields=FIELDS):
+    keys = ",\n".join(f'  "{field}": {FIELD_INSTRUCTIONS[field]}' for field in fields)
     return f"""
 You are a helpful assistant that extracts structured information from emails that describe upcoming events.
 
@@ -23,98 +56,397 @@ Email Body:
 Extract and return the following as a JSON object with exactly these keys:
 
 {{
-  "event_name": [A short name or title of the event, if provided. Otherwise "unknown"],
-  "description": [A brief summary of what the event is about, ideally 1-2 sentences.],
-  "location": [The venue, building, room, or address where the event will take place. If online, say so. If not mentioned, write "unknown"],
-  "date": [The date and time of the event in natural language (e.g., "Thursday at 6pm"). If not specified, write "unknown"],
-  "registration_required": ["yes" if the email says you must register or RSVP before attending, "no" if not required, or "unknown" if unclear],
-  "food_provided": [Mention the food being offered (e.g., "pizza", "light snacks", "catered dinner"). If no food will be provided, write "none". If the email doesn’t say, write "unknown"]
+{keys}
 }}
 
 Return only the JSON. Do not include any explanations or extra text.
 """
 
-# Query Ollama using langchain-ollama and parse JSON output
-def query_ollama(prompt):
-    result = model.invoke(input=prompt)
-    output = result.strip()
-
-    # Extract JSON substring from output
-    start = output.find("{")
-    end = output.rfind("}") + 1
-    json_str = output[start:end]
+def request_json(llm, prompt, opener):
+    # stream_json, recording the request time and approximate prompt / generated token counts
+    with metrics.span("llm_request"):
+        output, json_str = stream_json(llm, prompt, opener)
+    metrics.count("llm_prompt_tokens", estimate_tokens(prompt))
+    metrics.count("llm_decode_tokens", estimate_tokens(output))
+    return output, json_str
 
+def parse_output(output, json_str=None):
+    # json_str is the complete object found while streaming; otherwise scan the full output
+    if json_str is None:
+        _, json_str = first_json_value([output], "{")
+    if json_str is None:
+        metrics.count("json_parse_failures")
+        print("Warning: No complete JSON object in output:", output)
+        return None
     try:
         return json.loads(json_str)
     except json.JSONDecodeError:
+        metrics.count("json_parse_failures")
+        print("Warning: Failed to parse JSON output:", output)
+        return None
+
+# Retry failed or unparseable responses with exponential backoff.
+# Returns (raw output, parsed info); info is None if every attempt failed.
+def extract_with_retry(subject, body, fields=FIELDS):
+    prompt = build_prompt(subject, body, fields)
+    output = None
+    for attempt in range(MAX_RETRIES):
         try:
-            return json.loads(output + "}")
-        except json.JSONDecodeError:
-            print("Warning: Failed to parse JSON output:", output)
-            return None
-
-# Load emails from events DB
-def load_emails():
-    conn = sqlite3.connect("emails_events.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, subject, body FROM emails")
-    emails = cursor.fetchall()
-    conn.close()
-    return emails
+            # Generation stops as soon as the JSON object closes
+            output, json_str = request_json(json_model, prompt, "{")
+            info = parse_output(output, json_str)
+        except Exception as e:
+            metrics.count("llm_errors")
+            print(f"Warning: Ollama request failed: {e}")
+            info = None
+        if info:
+            return output, info
+        if attempt < MAX_RETRIES - 1:
+            time.sleep(BACKOFF_SECONDS * 2 ** attempt)
+    return output, None
+
+# Prompt asking for one JSON object per email, in an array keyed by email id
+def build_batch_prompt(jobs, fields):
+    keys = ",\n".join(f'    "{field}": {FIELD_INSTRUCTIONS[field]}' for field in fields)
+    emails = "\n\n".join(f"Email ID: {job['id']}\nEmail Subject:\n{job['subject']}\n\nEmail Body:\n{job['body']}" for job in jobs)
+    return f"""
+You are a helpful assistant that extracts structured information from emails that describe upcoming events.
+
+Below are {len(jobs)} separate emails. For each one, extract the following fields. Be precise, and if information is not clearly provided, write "unknown".
+
+{emails}
+
+Return a JSON array with exactly one object per email, in this form:
+
+[
+  {{
+    "email_id": [The Email ID given above],
+{keys}
+  }}
+]
+
+Return only the JSON array. Do not include any explanations or extra text.
+"""
+
+def parse_batch_output(json_str, fields):
+    """Returns {email_id: (info, the entry's text in the answer)} for the well-formed entries of a batched answer."""
+    try:
+        entries = json.loads(json_str or "")
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(entries, list):
+        return {}
+
+    # The array parsed, so walking it entry by entry finds each one's text as the model wrote it
+    decoder = json.JSONDecoder()
+    texts, position = [], json_str.index("[") + 1
+    for _ in entries:
+        while json_str[position] in " \t\r\n,":
+            position += 1
+        _, end = decoder.raw_decode(json_str, position)
+        texts.append(json_str[position:end])
+        position = end
+
+    results = {}
+    for entry, text in zip(entries, texts):
+        if not isinstance(entry, dict) or not all(field in entry for field in fields):
+            continue
+        try:
+            results[int(entry["email_id"])] = ({field: entry[field] for field in fields}, text)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return results
+
+# One attempt per batch; emails missing from the answer are retried on their own.
+# Returns (raw output, {email_id: (info, entry text)}, seconds taken).
+def extract_batch(jobs, fields):
+    started = time.time()
+    try:
+        output, json_str = request_json(model, build_batch_prompt(jobs, fields), "[")
+    except Exception as e:
+        metrics.count("llm_errors")
+        print(f"Warning: Ollama batch request failed: {e}")
+        return None, {}, time.time() - started
+    return output, parse_batch_output(json_str, fields), time.time() - started
+
+class AdaptiveBatchSize:
+    """Halves the batch size on slow or failing batches and grows it by one after clean, fast ones."""
+    def __init__(self, size=4, max_size=MAX_BATCH_SIZE):
+        self.size = size
+        self.max_size = max_size
+
+    def record(self, batch_size, failures, seconds):
+        if failures > batch_size // 4 or seconds > TARGET_BATCH_SECONDS:
+            self.size = max(1, self.size // 2)
+        elif failures == 0 and seconds < TARGET_BATCH_SECONDS / 2:
+            self.size = min(self.max_size, self.size + 1)
 
-# Save extracted info to a new database
-def save_extracted(events):
-    conn = sqlite3.connect("events_info.db")
+# Load emails classified as events that have no extracted info yet, with their near-duplicate cluster
+def load_emails(conn):
     cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS event_info (
-            id INTEGER PRIMARY KEY,
-            event_name TEXT,
-            description TEXT,
-            location TEXT,
-            date TEXT,
-            registration_required TEXT,
-            food_provided TEXT
+    cursor.execute("""
+        SELECT e.id, e.subject, e.body, COALESCE(c.cluster_id, e.id)
+        FROM predictions p
+        JOIN emails e ON e.id = p.email_id
+        LEFT JOIN event_info i ON i.email_id = p.email_id
+        LEFT JOIN event_links l ON l.email_id = p.email_id
+        LEFT JOIN email_clusters c ON c.email_id = p.email_id
+        WHERE p.is_event = 1 AND i.email_id IS NULL AND l.email_id IS NULL
+        ORDER BY e.id
+    """)
+    return cursor.fetchall()
+
+# Whether any email classified as an event still has no extracted info (what load_emails would return)
+def has_pending(conn):
+    return bool(conn.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM predictions p
+            LEFT JOIN event_info i ON i.email_id = p.email_id
+            LEFT JOIN event_links l ON l.email_id = p.email_id
+            WHERE p.is_event = 1 AND i.email_id IS NULL AND l.email_id IS NULL
         )
-    ''')
-
-    for item in events:
-        cursor.execute('''
-            INSERT OR REPLACE INTO event_info
-            (id, event_name, description, location, date, registration_required, food_provided)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            item['id'],
-            item.get('event_name', "unknown"),
-            item.get('description', "unknown"),
-            item.get('location', "unknown"),
-            item.get('date', "unknown"),
-            item.get('registration_required', "unknown"),
-            item.get('food_provided', "unknown")
-        ))
+    """).fetchone()[0])
+
+# Clusters that already have an event_info row (from an earlier run), mapped to that row's email id
+def load_cluster_events(conn):
+    return dict(conn.execute("""
+        SELECT c.cluster_id, MIN(i.email_id)
+        FROM email_clusters c JOIN event_info i ON i.email_id = c.email_id
+        GROUP BY c.cluster_id
+    """).fetchall())
 
+# Point an email at the event_info row of the email its event was extracted from
+def link_event(conn, email_id, event_id):
+    conn.execute("INSERT OR REPLACE INTO event_links (email_id, event_id) VALUES (?, ?)", (email_id, event_id))
     conn.commit()
-    conn.close()
 
-def main():
-    emails = load_emails()
-    extracted = []
+# Calendar invite / schema.org event per email (the earliest one if there are several), from parsing
+def load_candidates(conn):
+    rows = conn.execute("""
+        SELECT email_id, event_name, description, location, date
+        FROM event_candidates
+        ORDER BY email_id, starts_at IS NULL, starts_at
+    """)
+    fields = ["event_name", "description", "location", "date"]
+    candidates = {}
+    for email_id, *values in rows:
+        candidates.setdefault(email_id, {field: value for field, value in zip(fields, values) if value})
+    return candidates
 
-    for email in tqdm(emails, desc="Extracting info"):
-        id_, subject, body = email
-        prompt = build_prompt(subject, body)
-        info = query_ollama(prompt)
+# Save one email's extracted info to the event_info table, keyed by email id
+def save_extracted(conn, item):
+    conn.execute('''
+        INSERT OR REPLACE INTO event_info
+        (email_id, event_name, description, location, date, registration_required, food_provided)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        item['id'],
+        item.get('event_name', "unknown"),
+        item.get('description', "unknown"),
+        item.get('location', "unknown"),
+        item.get('date', "unknown"),
+        item.get('registration_required', "unknown"),
+        item.get('food_provided', "unknown")
+    ))
+    conn.commit()
 
-        if info:
-            info['id'] = id_
-            extracted.append(info)
-        else:
-            print(f"Skipping email id {id_} due to parse error.")
+def extract_pending(conn, cache, workers=CONCURRENCY, token_budget=TOKEN_BUDGET, llm_only=False, batch=False,
+                    stop=None, skip_ids=(), quiet=False):
+    """
+    Extracts event_info for every predicted event not extracted or linked yet (except skip_ids),
+    writing each result as it completes. Setting the stop event ends the run early, after the
+    requests already in flight. Returns counts, plus the ids that failed.
+    """
+    # Reminders and reposts of one announcement share a cluster and a single extraction
+    NearDuplicateIndex(conn).update()
+    emails = [row for row in load_emails(conn) if row[0] not in skip_ids]
+    candidates = load_candidates(conn)
+    cluster_events = load_cluster_events(conn)
+    cluster_of = {}
+    followers = {}  # email id being extracted -> near-duplicates waiting for its event_info row
+    extracted = 0
+    structured = 0
+    linked = 0
+    tokens_saved = 0
+    rules_only = 0
+    failed = []  # ids whose every LLM attempt failed
+    batch_size = AdaptiveBatchSize()
+
+    def save(id_, info):
+        nonlocal extracted, linked
+        info = dict(info, id=id_)
+        save_extracted(conn, info)
+        link_event(conn, id_, id_)
+        cluster_events.setdefault(cluster_of[id_], id_)
+        extracted += 1
+        for member in followers.pop(id_, []):
+            link_event(conn, member, id_)
+            linked += 1
+            progress.update(1)
+
+    def submit_single(job):
+        # Backpressure: keep at most two requests queued per worker
+        while len(in_flight) >= workers * 2:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            handle(done)
+        in_flight[pool.submit(extract_with_retry, job["subject"], job["body"], job["missing"])] = ("single", job)
+
+    def submit_batch(jobs):
+        while len(in_flight) >= workers * 2:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            handle(done)
+        if len(jobs) == 1:
+            in_flight[pool.submit(extract_with_retry, jobs[0]["subject"], jobs[0]["body"], jobs[0]["missing"])] = ("single", jobs[0])
+            return
+        # Ask for every field any member still needs; each email keeps only its own
+        fields = [field for field in FIELDS if any(field in job["missing"] for job in jobs)]
+        in_flight[pool.submit(extract_batch, jobs, fields)] = ("batch", jobs)
+
+    def handle(futures):
+        # Results are written as they complete, so a crash keeps finished work
+        for future, (kind, payload) in [(future, in_flight.pop(future)) for future in futures]:
+            if kind == "single":
+                job = payload
+                output, info = future.result()
+                if info:
+                    cache.put(job["key"], output, info)
+                    save(job["id"], {**info, **job["resolved"]})
+                else:
+                    failed.append(job["id"])
+                    print(f"Skipping email id {job['id']} due to parse error.")
+                progress.update(1)
+                continue
+
+            output, results, seconds = future.result()
+            retry_jobs = []
+            for job in payload:
+                if job["id"] not in results:
+                    retry_jobs.append(job)
+                    continue
+                # The raw output cached for an email is its own object from the batched answer
+                info, text = results[job["id"]]
+                info = {field: info[field] for field in job["missing"]}
+                cache.put(job["key"], text, info)
+                save(job["id"], {**info, **job["resolved"]})
+                progress.update(1)
+            batch_size.record(len(payload), len(retry_jobs), seconds)
+            metrics.count("batch_entries_failed", len(retry_jobs))
+
+            # Missing or malformed entries go back one at a time
+            for job in retry_jobs:
+                submit_single(job)
+
+    def flush_batch():
+        nonlocal pending, pending_tokens
+        if pending:
+            submit_batch(pending)
+        pending, pending_tokens = [], 0
+
+    in_flight = {}
+    pending, pending_tokens = [], 0
+    with ThreadPoolExecutor(max_workers=workers) as pool, tqdm(total=len(emails), desc="Extracting info", disable=quiet) as progress:
+        leaders = {}  # cluster id -> email id extracted for it in this run
+        for id_, subject, body, cluster in emails:
+            if stop is not None and stop.is_set():
+                break  # Shutting down: finish what is in flight, leave the rest queued
+            cluster_of[id_] = cluster
+            # Fill what the rules can; the LLM is only asked for the rest
+            resolved, missing = ({}, FIELDS) if llm_only else resolve(subject, body)
 
-        time.sleep(1)  # prevent overload if needed
+            # Invites and schema.org markup give exact fields; the rest comes from rules or stays "unknown"
+            if id_ in candidates:
+                save(id_, {**resolved, **candidates[id_]})
+                structured += 1
+                progress.update(1)
+                continue
 
-    save_extracted(extracted)
-    print(f"Extracted structured info from {len(extracted)} emails into 'events_info.db'.")
+            # A near-duplicate of an email that already has (or is getting) event_info
+            if cluster in cluster_events:
+                link_event(conn, id_, cluster_events[cluster])
+                linked += 1
+                progress.update(1)
+                continue
+            if cluster in leaders:
+                followers.setdefault(leaders[cluster], []).append(id_)
+                continue
+            leaders[cluster] = id_
+
+            if not missing:
+                save(id_, resolved)
+                rules_only += 1
+                progress.update(1)
+                continue
+
+            # Only the spans mentioning dates, places, food or registration go into the prompt
+            if token_budget:
+                body, saved = compact_body(body, token_budget)
+                tokens_saved += saved
+
+            # Same model, prompt and text as an earlier run: reuse the answer
+            key = cache_key(model.model, PROMPT_VERSION, ",".join(missing), subject, body)
+            cached = cache.get(key)
+            if cached:
+                metrics.count("cache_hits")
+                save(id_, {**cached, **resolved})
+                progress.update(1)
+                continue
+
+            job = {"id": id_, "subject": subject, "body": body, "missing": missing, "resolved": resolved, "key": key}
+            tokens = estimate_tokens(body)
+            if not batch or tokens > SHORT_EMAIL_TOKENS:
+                submit_single(job)
+                continue
+
+            # Group short emails until the batch is full by count or by tokens
+            if pending and (len(pending) >= batch_size.size or pending_tokens + tokens > BATCH_TOKEN_BUDGET):
+                flush_batch()
+            pending.append(job)
+            pending_tokens += tokens
+        flush_batch()
+
+        # Drain, including emails re-queued from batches
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            handle(done)
+
+
+    for name, value in [("emails_extracted", extracted), ("emails_linked", linked), ("structured_only", structured),
+                        ("rules_only", rules_only), ("prompt_tokens_saved", tokens_saved)]:
+        metrics.count(name, value)
+    return {"emails": len(emails), "extracted": extracted, "linked": linked, "structured": structured,
+            "rules_only": rules_only, "tokens_saved": tokens_saved, "failed": failed}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Extract event details from emails classified as events.")
+    arg_parser.add_argument("--workers", type=int, default=CONCURRENCY,
+                            help="concurrent Ollama requests (match OLLAMA_NUM_PARALLEL on the server)")
+    arg_parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET,
+                            help="compact each body to its event-relevant spans within this many tokens (0 = send whole body)")
+    arg_parser.add_argument("--llm-only", action="store_true",
+                            help="ask the LLM for every field instead of filling what the rules can first")
+    arg_parser.add_argument("--batch", action="store_true",
+                            help="pack several short emails into one prompt")
+    args = arg_parser.parse_args()
+    metrics.init("07_extract")
+
+    conn = email_store.connect()
+    cache = LLMCache(conn)
+    stats = extract_pending(conn, cache, args.workers, args.token_budget, args.llm_only, args.batch)
+    extracted, linked, structured, rules_only, tokens_saved = (
+        stats[key] for key in ("extracted", "linked", "structured", "rules_only", "tokens_saved"))
+
+    cache.evict()
+    conn.close()
+    print(f"Extracted structured info from {extracted} emails into table 'event_info'.")
+    print(f"{linked} near-duplicate emails (reminders, reposts) were linked to an existing event_info row.")
+    print(f"{structured} emails were filled from calendar invites or event markup, with no LLM call.")
+    print(f"{rules_only} emails were filled by rules alone, with no LLM call.")
+    print(cache.summary())
+    if stats["emails"]:
+        print(f"Prompt compaction saved ~{tokens_saved} tokens ({tokens_saved // stats['emails']} per email).")
+    if stats["failed"]:
+        # Non-zero, so 08_pipeline.py doesn't record the stage as done while emails are still queued
+        sys.exit(f"Extraction failed for {len(stats['failed'])} emails; they stay queued for the next run.")
 
 if __name__ == "__main__":
     main()
@@ -1,21 +1,236 @@
 import os
+import sys
 import time
+import queue
+import sqlite3
+import hashlib
+import argparse
+import threading
+import subprocess
+import metrics
+import ollama_service
 
-def run(cmd):
-    print(f"\n[Running] {cmd}")
-    os.system(cmd)
+# Runs the pipeline as a small DAG. Each stage declares the stages it needs and the files and
+# tables it reads and writes; a stage whose inputs and outputs are exactly as they were after
+# its last successful run is skipped (so a run with no new mail finishes in seconds), and
+# stages whose dependencies are done start right away, e.g. Ollama starts and loads the model
+# while 02 scrapes. A failing stage stops the run (nothing new is started; a failing background
+# stage only holds back the stages that need it) and the exit code is non-zero.
+# Stage fingerprints live in the pipeline_stages table of emails.db.
+#     python 08_pipeline.py
+#     python 08_pipeline.py --local ~/mail/export.mbox   # 02b instead of scraping Outlook
+#     python 08_pipeline.py --force classify extract
+
+DB_NAME = "emails.db"
+PYTHON = sys.executable
+DONE = ("ok", "skipped")
+
+# Inputs a row count can't see, named by "query:<name>" sources
+QUERIES = {
+    # Which emails are predicted events: 06 --rescore replaces predictions in place, which
+    # leaves the table's count and max rowid unchanged even when a prediction flips
+    "predicted_events": "SELECT COUNT(*), TOTAL(email_id) FROM predictions WHERE is_event = 1",
+}
+
+class Stage:
+    """
+    A command (argv list, or a function returning an error message or None) and what it depends on.
+    inputs and outputs are "file:<path>" / "table:<name>" / "query:<name in QUERIES>"; inputs=None means always run.
+    Nothing waits for a background stage unless a later stage depends on it.
+    """
+    def __init__(self, name, command, deps=(), inputs=None, outputs=(), background=False):
+        self.name = name
+        self.command = command
+        self.deps = list(deps)
+        self.inputs = inputs
+        self.outputs = list(outputs)
+        self.background = background
+
+def build_stages(local_paths=None):
+    if local_paths:
+        scrape = Stage("scrape", [PYTHON, "02b_ingest_local_mail.py", *local_paths, "--db", DB_NAME], deps=["install"],
+                       inputs=["file:02b_ingest_local_mail.py"] + [f"file:{path}" for path in local_paths],
+                       outputs=["table:emails"])
+    else:
+        # The mailbox is remote, so there is nothing to compare: always scrape (02 stops at the newest stored email)
+        scrape = Stage("scrape", ["xvfb-run", PYTHON, "02_extract_parse_emails.py"], deps=["install"])
+    return [
+        Stage("install", ["bash", "01_install_dependencies.sh"], inputs=["file:01_install_dependencies.sh"]),
+        scrape,
+        Stage("ollama", start_ollama, deps=["install"], background=True),
+        Stage("classify", [PYTHON, "06_classify_emails.py"], deps=["scrape"],
+              inputs=["file:06_classify_emails.py", "file:event_classifier.pkl", "table:emails", "table:labels"],
+              outputs=["table:predictions"]),
+        Stage("extract", [PYTHON, "07_extract_event_info.py"], deps=["classify", "ollama"],
+              inputs=["file:07_extract_event_info.py", "query:predicted_events", "table:event_candidates"],
+              outputs=["table:event_info", "table:event_links"]),
+    ]
+
+def start_ollama():
+    return ollama_service.ensure_running() or ollama_service.warm()
+
+def path_state(path):
+    # Size and modification time, like make; directories (Maildir, .eml folders) by their files
+    if os.path.isdir(path):
+        stats = [os.stat(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names]
+        return f"{len(stats)},{sum(s.st_size for s in stats)},{max((s.st_mtime_ns for s in stats), default=0)}"
+    if os.path.exists(path):
+        stat = os.stat(path)
+        return f"{stat.st_size},{stat.st_mtime_ns}"
+    return "missing"
+
+def query_state(conn, sql):
+    try:
+        return ",".join(map(str, conn.execute(sql).fetchone()))
+    except sqlite3.OperationalError:
+        return "missing"
+
+def table_state(conn, table):
+    return query_state(conn, f"SELECT COUNT(*), MAX(rowid) FROM {table}")
+
+def fingerprint(conn, sources):
+    parts = []
+    for source in sources:
+        kind, _, target = source.partition(":")
+        if kind == "table":
+            state = table_state(conn, target)
+        elif kind == "query":
+            state = query_state(conn, QUERIES[target])
+        else:
+            state = path_state(target)
+        parts.append(f"{source}={state}")
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+def connect_state(db_name=DB_NAME):
+    conn = sqlite3.connect(db_name, timeout=30)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pipeline_stages (
+            stage TEXT PRIMARY KEY,
+            inputs TEXT,
+            outputs TEXT,
+            finished_at TEXT,
+            seconds REAL
+        )
+    ''')
+    conn.commit()
+    return conn
+
+def up_to_date(conn, stage):
+    if stage.inputs is None:
+        return False
+    row = conn.execute("SELECT inputs, outputs FROM pipeline_stages WHERE stage = ?", (stage.name,)).fetchone()
+    return row == (fingerprint(conn, stage.inputs), fingerprint(conn, stage.outputs))
+
+def record_success(conn, stage, inputs, seconds):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO pipeline_stages (stage, inputs, outputs, finished_at, seconds) VALUES (?, ?, ?, ?, ?)",
+                     (stage.name, inputs, fingerprint(conn, stage.outputs),
+                      time.strftime("%Y-%m-%dT%H:%M:%S"), round(seconds, 3)))
+
+def execute(stage, done):
+    # Runs in a worker thread; the result goes back to the scheduler through done
+    started = time.monotonic()
+    if callable(stage.command):
+        try:
+            error = stage.command()
+        except Exception as e:
+            error = str(e)
+    else:
+        try:
+            code = subprocess.run(stage.command).returncode
+            error = f"exit code {code}" if code else None
+        except OSError as e:
+            error = str(e)
+    done.put((stage.name, error, time.monotonic() - started))
+
+def run_pipeline(stages, conn, force=(), skip=()):
+    """Runs stages as their dependencies finish. Returns {stage: (status, detail)}."""
+    by_name = {stage.name: stage for stage in stages}
+    results = {}
+    pending = list(stages)
+    running = {}  # stage name -> input fingerprint taken at its start
+    done = queue.Queue()
+    failed = False
+
+    while True:
+        # Start (or skip) everything whose dependencies are done
+        ready = [stage for stage in pending if all(results.get(dep, ("",))[0] in DONE for dep in stage.deps)]
+        for stage in ready if not failed else []:
+            pending.remove(stage)
+            if stage.name in skip:
+                results[stage.name] = ("skipped", "--skip")
+                print(f"[{stage.name}] skipped (--skip)")
+            elif stage.name not in force and "all" not in force and up_to_date(conn, stage):
+                results[stage.name] = ("skipped", "inputs unchanged")
+                print(f"[{stage.name}] skipped: inputs unchanged since its last successful run")
+            else:
+                running[stage.name] = fingerprint(conn, stage.inputs) if stage.inputs is not None else None
+                print(f"[{stage.name}] started" + (f": {' '.join(stage.command)}" if not callable(stage.command) else ""))
+                threading.Thread(target=execute, args=(stage, done), daemon=True).start()
+        if ready and not failed:
+            continue  # Skipped stages may have unblocked others
+
+        # Wait only for stages that are in the foreground or that something still pending needs
+        needed = set() if failed else {dep for stage in pending for dep in stage.deps}
+        if not any(not by_name[name].background or name in needed for name in running):
+            break
+        name, error, seconds = done.get()
+        inputs = running.pop(name)
+        if error:
+            results[name] = ("FAILED", error)
+            print(f"[{name}] FAILED after {seconds:.1f}s: {error}")
+            failed = failed or not by_name[name].background
+        else:
+            results[name] = ("ok", f"{seconds:.1f}s")
+            print(f"[{name}] ok ({seconds:.1f}s)")
+            if inputs is not None or by_name[name].outputs:
+                record_success(conn, by_name[name], inputs, seconds)
+
+    for name in running:
+        results[name] = ("abandoned", "still running, not needed")
+    for stage in pending:
+        blocked = [dep for dep in stage.deps if results.get(dep, ("",))[0] not in DONE]
+        results[stage.name] = ("not run", f"{blocked[0]} {results[blocked[0]][0]}" if blocked and blocked[0] in results
+                               else "stopped after a failure")
+    return results
 
 def main():
-    run("bash 01_install_dependencies.sh")
-    run("xvfb-run python 02_extract_parse_emails.py")
-    run("python 03_fill_database.py")
-    run("python 06_classify_emails.py")
-
-    # Start Ollama server (in background)
-    print("Starting Ollama server...")
-    os.system("ollama serve &")
-    time.sleep(10)  # give it a moment to start
-    run("python 07_extract_event_info.py")
+    arg_parser = argparse.ArgumentParser(description="Run the whole pipeline, skipping stages whose inputs are unchanged.")
+    arg_parser.add_argument("--local", nargs="+", metavar="PATH",
+                            help="ingest these .eml / mbox / Maildir exports with 02b instead of scraping Outlook")
+    arg_parser.add_argument("--force", nargs="+", default=[], metavar="STAGE",
+                            help="run these stages even if their inputs are unchanged ('all' for every stage)")
+    arg_parser.add_argument("--skip", nargs="+", default=[], metavar="STAGE", help="treat these stages as done")
+    arg_parser.add_argument("--profile", metavar="DIR",
+                            help="run every stage under cProfile and tracemalloc, writing <stage>.prof / <stage>.txt here")
+    args = arg_parser.parse_args()
+
+    stages = build_stages(args.local)
+    unknown = set(args.force + args.skip) - {stage.name for stage in stages} - {"all"}
+    if unknown:
+        arg_parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    # Every stage records its spans and counters under this run id (see metrics.py)
+    run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    os.environ["EVENTLIST_RUN_ID"] = run_id
+    if args.profile:
+        os.environ["EVENTLIST_PROFILE"] = os.path.abspath(args.profile)
+
+    started = time.monotonic()
+    conn = connect_state()
+    results = run_pipeline(stages, conn, set(args.force), set(args.skip))
+    conn.close()
+
+    print(f"\nPipeline finished in {time.monotonic() - started:.1f}s:")
+    for stage in stages:
+        status, detail = results[stage.name]
+        print(f"  {stage.name:10} {status:10} {detail}")
+    if any(results[stage.name][0] == "ok" and not callable(stage.command) for stage in stages):
+        print()
+        print(metrics.report(run_id))
+    if args.profile:
+        print(f"Profiles written to '{args.profile}'.")
+    sys.exit(1 if any(status == "FAILED" for status, _ in results.values()) else 0)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import fcntl
+import signal
+import argparse
+import threading
+import traceback
+import email_store
+import metrics
+import ollama_service
+from pipeline_scripts import load_script
+from llm_cache import LLMCache
+from verdict_cache import VerdictCache, MIN_COUNT, CONFIDENCE
+
+# Long-running alternative to starting 06 and 07 after every scrape. The classifier, the
+# LangChain/Ollama clients and a warm model stay loaded while the daemon watches emails.db;
+# whenever another process (02, 02b, 03) commits new emails, they are classified and their
+# events extracted within a poll interval. The work queue is the database itself (emails with
+# no prediction, predicted events with no event_info / event_links row), so a restart picks up
+# exactly where the last run stopped. SIGINT / SIGTERM let the requests in flight finish, then
+# exit; a second signal exits at once. Only one daemon runs per directory.
+#     python 09_daemon.py
+#     python 09_daemon.py --poll 5 --batch
+
+POLL_SECONDS = 2
+WARM_SECONDS = 240              # Re-warm this often: each of 07's requests resets Ollama's keep_alive to 5 minutes
+VERDICT_REFRESH_SECONDS = 3600  # Recount list/sender verdicts at least this often (and whenever labels change)
+MAX_FAILURES = 3                # Failed extractions before an email is left alone until the next restart
+LOCK_PATH = "eventlist_daemon.lock"
+
+def log(message):
+    print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+class EventDaemon:
+    """Keeps 06's model and 07's clients loaded and runs both over whatever is queued in emails.db."""
+    def __init__(self, conn, args):
+        self.conn = conn
+        self.args = args
+        self.classify = load_script("06_classify_emails.py")
+        self.extract = load_script("07_extract_event_info.py")
+        self.cache = LLMCache(conn)
+        self.verdicts = None if args.no_cascade else VerdictCache(conn, args.min_count, args.confidence)
+        self.model_stat = None
+        self.labels_state = None
+        self.verdicts_at = 0
+        self.warmed_at = 0
+        self.failures = {}  # email id -> failed extractions since start
+        self.data_version = None
+        self.waiting = False  # Events are queued but Ollama was not ready: retry on every poll
+        self.ollama_error = None
+
+    def changed(self):
+        # data_version moves whenever another connection commits to the database
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        changed = version != self.data_version
+        self.data_version = version
+        return changed
+
+    def refresh_model(self):
+        stat = os.stat(self.classify.MODEL_PATH)
+        if (stat.st_size, stat.st_mtime_ns) != self.model_stat:
+            # First start, or 05 / 05b replaced the pickle
+            with metrics.span("model_load"):
+                self.version, self.model = self.classify.load_model()
+            self.model_stat = (stat.st_size, stat.st_mtime_ns)
+            log(f"Loaded classifier {self.version}.")
+
+    def refresh_verdicts(self):
+        if self.verdicts is None:
+            return
+        labels = self.conn.execute("SELECT COUNT(*), MAX(seq) FROM labels").fetchone()
+        if labels != self.labels_state or time.monotonic() - self.verdicts_at > VERDICT_REFRESH_SECONDS:
+            self.verdicts.rebuild()
+            self.labels_state = labels
+            self.verdicts_at = time.monotonic()
+
+    def ollama_ready(self):
+        if self.warmed_at and ollama_service.is_ready():
+            return True
+        error = ollama_service.ensure_running() or ollama_service.warm()
+        if error:
+            if error != self.ollama_error:  # Once, not on every poll while it stays down
+                log(f"Ollama not ready, extraction waits: {error}")
+            self.ollama_error = error
+            return False
+        if self.ollama_error:
+            log("Ollama is back, extracting what was queued.")
+        self.ollama_error = None
+        self.warmed_at = time.monotonic()
+        return True
+
+    def keep_warm(self):
+        if self.warmed_at and time.monotonic() - self.warmed_at > WARM_SECONDS and ollama_service.warm() is None:
+            self.warmed_at = time.monotonic()
+
+    def run_once(self, stop):
+        """Classifies and extracts everything queued. Returns True if anything was done."""
+        try:
+            return self.process(stop)
+        except Exception:
+            # One bad cycle (a malformed email, a dropped connection) must not stop the daemon;
+            # finished work is committed and the rest stays queued for the next cycle
+            self.conn.rollback()
+            log(f"Cycle failed, retrying on the next change:\n{traceback.format_exc()}")
+            return False
+
+    def process(self, stop):
+        started = time.monotonic()
+        self.refresh_model()
+        self.refresh_verdicts()
+        scored, events, _ = self.classify.classify_pending(self.conn, self.model, self.version, self.verdicts)
+
+        stats = {"emails": 0, "extracted": 0, "linked": 0}
+        ready = not stop.is_set() and self.ollama_ready()
+        # Nothing may commit while Ollama is down, so data_version alone would never bring the queue back
+        self.waiting = not stop.is_set() and not ready and self.extract.has_pending(self.conn)
+        if ready:
+            skip = {id_ for id_, count in self.failures.items() if count >= MAX_FAILURES}
+            workers = self.args.workers or self.extract.CONCURRENCY
+            stats = self.extract.extract_pending(self.conn, self.cache, workers, batch=self.args.batch,
+                                                 stop=stop, skip_ids=skip, quiet=True)
+            for id_ in stats["failed"]:
+                self.failures[id_] = self.failures.get(id_, 0) + 1
+        if not scored and not stats["emails"]:
+            return False
+
+        log(f"Classified {scored} new emails ({events} events); extracted {stats['extracted']}, "
+            f"linked {stats['linked']} in {time.monotonic() - started:.1f}s.")
+        return True
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Keep the models loaded and classify / extract new emails as they arrive.")
+    arg_parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="seconds between checks for new emails")
+    arg_parser.add_argument("--workers", type=int, help="concurrent Ollama requests (default: as 07)")
+    arg_parser.add_argument("--batch", action="store_true", help="pack several short emails into one prompt (see 07)")
+    arg_parser.add_argument("--no-cascade", action="store_true", help="run the model on every email (see 06)")
+    arg_parser.add_argument("--min-count", type=int, default=MIN_COUNT)
+    arg_parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    args = arg_parser.parse_args()
+
+    lock = open(LOCK_PATH, "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        sys.exit(f"Another daemon is already running here (lock '{LOCK_PATH}').")
+
+    stop = threading.Event()
+    def on_signal(signum, frame):
+        if stop.is_set():
+            log("Exiting now.")
+            os._exit(1)  # Every write is its own transaction, so the database stays consistent
+        log("Shutting down after the requests in flight (signal again to exit now)...")
+        stop.set()
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    metrics.init("09_daemon")
+    conn = email_store.connect()
+    daemon = EventDaemon(conn, args)
+    daemon.refresh_model()
+    if daemon.ollama_ready():
+        log(f"Ollama ready at {ollama_service.base_url()} with {ollama_service.MODEL} loaded.")
+    log(f"Watching '{email_store.DB_NAME}' every {args.poll:g}s (Ctrl+C to stop).")
+
+    # The first check always counts as changed, so whatever was queued before the start is drained.
+    # After a cycle that did work, check once more: emails may have landed while it ran; while
+    # events wait for Ollama, check every poll.
+    work = False
+    while not stop.is_set():
+        if daemon.changed() or work or daemon.waiting:
+            work = daemon.run_once(stop)
+            if work:
+                metrics.flush()
+        daemon.keep_warm()
+        stop.wait(args.poll)
+
+    daemon.cache.evict()
+    conn.close()
+    log("Stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import mailbox
+import argparse
+import resource
+import tempfile
+import subprocess
+import contextlib
+import urllib.request
+from email import policy
+from email.parser import BytesParser
+from datetime import datetime
+import numpy as np
+from pipeline_scripts import load_script
+
+# End-to-end benchmark: generates synthetic mailboxes (synthetic_mailbox.py) and times every
+# stage on them. Each stage runs in its own process, so peak RSS is per stage:
+#   parse     - email_parsing.parse_message (get_body, reply splitting) on every message, as 02b does
+#   fill      - 03_fill_database.py loading the parsed emails into emails.db
+#   classify  - 06_classify_emails.py with the repo's event_classifier.pkl
+#   extract   - 07_extract_event_info.py against fake_ollama_server.py
+# Results (throughput, p50/p95 latency, peak RSS per stage and size) are written as JSON:
+#     python benchmark.py --sizes 1000 10000 100000 --output bench_output.json
+# Compare the JSON files of two commits to spot regressions.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ["parse", "fill", "classify", "extract"]
+LATENCY_UNITS = {"parse": "message", "fill": "email", "classify": "chunk", "extract": "LLM request"}
+
+def time_calls(owner, name, latencies):
+    """Replaces owner.name with a wrapper that appends each call's duration to latencies."""
+    original = getattr(owner, name)
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+    setattr(owner, name, timed)
+
+def time_intervals(owner, name, latencies):
+    """Records the time between successive calls to owner.name (one loop iteration of the caller)."""
+    original = getattr(owner, name)
+    last = []
+    def timed(*args, **kwargs):
+        now = time.perf_counter()
+        if last:
+            latencies.append(now - last[0])
+        result = original(*args, **kwargs)
+        last[:] = [time.perf_counter() if result else now]
+        return result
+    setattr(owner, name, timed)
+
+def run_parse(workdir, latencies):
+    from email_parsing import parse_message
+    box = mailbox.mbox(os.path.join(workdir, "mailbox.mbox"), factory=None, create=False)
+    parsed = []
+    for key in box.iterkeys():
+        raw = box.get_bytes(key)
+        started = time.perf_counter()
+        item = parse_message(BytesParser(policy=policy.default).parsebytes(raw))
+        latencies.append(time.perf_counter() - started)
+        if item is not None:
+            parsed.append(item)
+    with open(os.path.join(workdir, "parsed_emails.json"), "w", encoding="utf-8") as f:
+        json.dump(parsed, f, ensure_ascii=False)
+    return len(latencies)
+
+def run_fill(workdir, latencies):
+    import email_store
+    time_calls(email_store.EmailWriter, "add", latencies)
+    load_script("03_fill_database.py").json_to_sqlite()
+    return len(latencies)
+
+def run_classify(workdir, latencies):
+    module = load_script("06_classify_emails.py")
+    time_intervals(module, "load_unscored_emails", latencies)
+    sys.argv = ["06_classify_emails.py"]
+    module.main()
+    import email_store
+    conn = email_store.connect()
+    count = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+    conn.close()
+    return count
+
+def run_extract(workdir, latencies):
+    module = load_script("07_extract_event_info.py")
+    time_calls(module, "extract_with_retry", latencies)
+    time_calls(module, "extract_batch", latencies)
+    sys.argv = ["07_extract_event_info.py"]
+    module.main()
+    import email_store
+    conn = email_store.connect()
+    count = conn.execute("SELECT COUNT(*) FROM event_info").fetchone()[0]
+    count += conn.execute("SELECT COUNT(*) FROM event_links WHERE email_id != event_id").fetchone()[0]
+    conn.close()
+    return count
+
+def run_stage(stage, workdir):
+    """Runs one stage in this process and prints its measurements as one JSON line."""
+    os.chdir(workdir)
+    latencies = []
+    started = time.perf_counter()
+    # Stage output goes to stderr; stdout carries only the result line
+    with contextlib.redirect_stdout(sys.stderr):
+        items = globals()[f"run_{stage}"](workdir, latencies)
+    seconds = time.perf_counter() - started
+    print(json.dumps({
+        "items": items,
+        "seconds": round(seconds, 3),
+        "throughput_per_s": round(items / seconds, 1) if seconds else None,
+        "latency_unit": LATENCY_UNITS[stage],
+        "latency_samples": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3) if latencies else None,
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3) if latencies else None,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_fake_ollama(token_ms, prompt_ms):
+    port = free_port()
+    server = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "fake_ollama_server.py"), "--port", str(port),
+                               "--token-ms", str(token_ms), "--prompt-ms", str(prompt_ms)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1)
+            return server, f"127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("fake Ollama server did not start")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic mailboxes.")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    arg_parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    arg_parser.add_argument("--output", default="bench_output.json")
+    arg_parser.add_argument("--workdir", help="keep the generated mailboxes and databases here (default: a temporary directory)")
+    arg_parser.add_argument("--token-ms", type=float, default=0, help="fake Ollama delay per streamed chunk")
+    arg_parser.add_argument("--prompt-ms", type=float, default=0, help="fake Ollama delay per 1000 prompt characters")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--verbose", action="store_true", help="show the stages' own output")
+    arg_parser.add_argument("--run-stage", choices=STAGES, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.run_stage:
+        run_stage(args.run_stage, args.workdir)
+        return
+
+    from synthetic_mailbox import generate
+
+    base = args.workdir or tempfile.mkdtemp(prefix="eventlist-bench-")
+    server, host = start_fake_ollama(args.token_ms, args.prompt_ms) if "extract" in args.stages else (None, None)
+    results = {"commit": git_commit(), "created_at": datetime.now().isoformat(timespec="seconds"),
+               "python": sys.version.split()[0], "fake_ollama": {"token_ms": args.token_ms, "prompt_ms": args.prompt_ms},
+               "sizes": {}}
+    try:
+        for size in args.sizes:
+            workdir = os.path.join(base, str(size))
+            shutil.rmtree(workdir, ignore_errors=True)
+            os.makedirs(workdir)
+            shutil.copy(os.path.join(REPO_DIR, "event_classifier.pkl"), workdir)
+            if os.path.isdir(os.path.join(REPO_DIR, "event_classifier_compact")):
+                shutil.copytree(os.path.join(REPO_DIR, "event_classifier_compact"), os.path.join(workdir, "event_classifier_compact"))
+
+            started = time.perf_counter()
+            events = generate(os.path.join(workdir, "mailbox.mbox"), size, seed=args.seed, prefix=os.path.join(REPO_DIR, "EX_"))
+            results["sizes"][str(size)] = {"generate": {"items": size, "events": events,
+                                                        "seconds": round(time.perf_counter() - started, 3)}}
+            print(f"{size} emails ({events} events):")
+
+            env = dict(os.environ, OLLAMA_HOST=host or "")
+            for stage in args.stages:
+                proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-stage", stage, "--workdir", workdir],
+                                      env=env, stdout=subprocess.PIPE, text=True,
+                                      stderr=None if args.verbose else subprocess.DEVNULL)
+                if proc.returncode != 0 or not proc.stdout.strip():
+                    result = {"error": f"exit code {proc.returncode}"}
+                else:
+                    result = json.loads(proc.stdout.strip().splitlines()[-1])
+                results["sizes"][str(size)][stage] = result
+                if "error" in result:
+                    print(f"  {stage:9} failed ({result['error']}; rerun with --verbose)")
+                else:
+                    print(f"  {stage:9} {result['items']:7} in {result['seconds']:8.2f}s  {result['throughput_per_s']:9.1f}/s  "
+                          f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms per {result['latency_unit']}  "
+                          f"peak RSS {result['peak_rss_mb']} MB")
+    finally:
+        if server:
+            server.kill()
+        if not args.workdir:
+            shutil.rmtree(base, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"Results written to '{args.output}'.")
+
+if __name__ == "__main__":
+    main()
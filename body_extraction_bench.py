@@ -0,0 +1,124 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+from bs4 import BeautifulSoup
+import email_parsing
+from synthetic_mailbox import newsletter_html
+
+# Equivalence check and micro-benchmark for the body extraction in email_parsing.py.
+# The reference_* functions are the original get_body / clean_html / split_replies; they
+# run side by side with the current ones (every available HTML backend) over messages
+# built from the EX_parsed_emails.json corpus, plus any .eml files given with --eml:
+#     python body_extraction_bench.py
+#     python body_extraction_bench.py --eml saved_emails --repeat 5
+
+def reference_clean_html(html_content):
+    soup = BeautifulSoup(html_content, "html.parser")
+    for script_or_style in soup(['script', 'style']):
+        script_or_style.decompose()
+    return ' '.join(soup.get_text().split())
+
+def reference_get_body(msg):
+    if msg.is_multipart():
+        body = ""
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            content_disposition = str(part.get("Content-Disposition"))
+
+            if content_type == "text/plain" and "attachment" not in content_disposition:
+                body = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="replace")
+            if content_type == "text/html" and "attachment" not in content_disposition:
+                body = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="replace")
+                body = reference_clean_html(body)
+                break
+        return body
+    else:
+        body = msg.get_payload(decode=True).decode(msg.get_content_charset() or "utf-8", errors="replace")
+        if "html" in msg.get_content_type().lower():
+            body = reference_clean_html(body)
+        return body
+
+def reference_split_replies(body):
+    pattern = re.compile("|".join([r'(?=From:.+)']), flags=re.MULTILINE)
+    return [part.strip() for part in pattern.split(body) if part.strip()]
+
+def corpus_messages(path):
+    with open(path, encoding="utf-8") as f:
+        emails = json.load(f)
+    messages = []
+    for email in emails:
+        msg = EmailMessage()
+        msg["Subject"] = email["subject"].replace("\n", " ").replace("\r", " ")
+        msg.set_content(email["body"] or " ")
+        msg.add_alternative(newsletter_html(email["subject"], email["body"]), subtype="html")
+        messages.append(BytesParser(policy=policy.default).parsebytes(bytes(msg)))
+    return messages
+
+def eml_messages(paths):
+    messages = []
+    for path in paths:
+        files = [path] if os.path.isfile(path) else [os.path.join(root, name) for root, _, names in os.walk(path)
+                                                     for name in names if name.lower().endswith(".eml")]
+        for name in files:
+            with open(name, "rb") as f:
+                messages.append(BytesParser(policy=policy.default).parse(f))
+    return messages
+
+def html_parts(msg):
+    return [part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="replace")
+            for part in msg.walk() if part.get_content_type() == "text/html"]
+
+def timed(function, items, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            function(item)
+    return (time.perf_counter() - started) / repeat
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Check and time email_parsing's body extraction against the original.")
+    arg_parser.add_argument("--corpus", default="EX_parsed_emails.json")
+    arg_parser.add_argument("--eml", nargs="*", default=[], help=".eml files or directories to include")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    messages = corpus_messages(args.corpus) + eml_messages(args.eml)
+    pages = [page for msg in messages for page in html_parts(msg)]
+    bodies = [reference_get_body(msg) for msg in messages]
+    print(f"{len(messages)} messages, {len(pages)} HTML parts; backends: {', '.join(email_parsing.HTML_BACKENDS)} "
+          f"(default {email_parsing.HTML_BACKEND})")
+
+    # Equivalence
+    failures = sum(email_parsing.get_body(msg) != body for msg, body in zip(messages, bodies))
+    print(f"get_body: {len(messages) - failures}/{len(messages)} identical to the original")
+    for backend in email_parsing.HTML_BACKENDS:
+        same = sum(email_parsing.clean_html(page, backend) == reference_clean_html(page) for page in pages)
+        print(f"clean_html [{backend}]: {same}/{len(pages)} identical to the original")
+        failures += len(pages) - same
+    same = sum(email_parsing.split_replies(body) == reference_split_replies(body) for body in bodies)
+    print(f"split_replies: {same}/{len(bodies)} identical to the original")
+    failures += len(bodies) - same
+
+    # Micro-benchmark
+    print(f"\nTimings (mean of {args.repeat} runs over the whole set):")
+    rows = [("get_body (original)", reference_get_body, messages),
+            ("get_body", email_parsing.get_body, messages),
+            ("clean_html (original)", reference_clean_html, pages)]
+    rows += [(f"clean_html [{backend}]", lambda page, backend=backend: email_parsing.clean_html(page, backend), pages)
+             for backend in email_parsing.HTML_BACKENDS]
+    rows += [("split_replies (original)", reference_split_replies, bodies),
+             ("split_replies", email_parsing.split_replies, bodies)]
+    for name, function, items in rows:
+        seconds = timed(function, items, args.repeat)
+        print(f"  {name:26} {seconds * 1000:9.1f} ms  ({seconds * 1e6 / max(len(items), 1):8.1f} us each)")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os, json
+from cryptography.fernet import Fernet, InvalidToken
+
+# Encrypted on-disk copy of the Playwright storage_state (cookies + local storage)
+# so 02_extract_parse_emails.py can skip the Kerberos / Duo login while the session is valid.
+# The key lives outside the repo, readable only by the current user.
+
+SESSION_FILE = "outlook_session.enc"
+KEY_FILE = os.path.expanduser("~/.config/eventlist/session.key")
+
+def _write_private(path, data):
+    # Write atomically with 0600 permissions
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _fernet():
+    if not os.path.exists(KEY_FILE):
+        os.makedirs(os.path.dirname(KEY_FILE), exist_ok=True)
+        _write_private(KEY_FILE, Fernet.generate_key())
+    with open(KEY_FILE, "rb") as f:
+        return Fernet(f.read())
+
+def load_session():
+    """Returns the saved storage_state dict, or None if there is none or it can't be decrypted."""
+    if not os.path.exists(SESSION_FILE):
+        return None
+    try:
+        with open(SESSION_FILE, "rb") as f:
+            return json.loads(_fernet().decrypt(f.read()))
+    except (InvalidToken, ValueError):
+        print("Saved session could not be read, logging in again.")
+        return None
+
+def save_session(storage_state):
+    _write_private(SESSION_FILE, _fernet().encrypt(json.dumps(storage_state).encode("utf-8")))
+
+def clear_session():
+    if os.path.exists(SESSION_FILE):
+        os.remove(SESSION_FILE)
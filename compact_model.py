@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import hashlib
+import argparse
+import numpy as np
+
+# Compact export of the TF-IDF + logistic regression pipeline in event_classifier.pkl, written by
+# 05_train_model.py next to the pickle. Instead of sklearn objects and a Python vocabulary dict it
+# is a directory of plain .npy arrays: sorted 64-bit hashes of the vocabulary terms, and the IDF
+# and coefficient of each term in the same order. np.load memory-maps them, so 06 (or a
+# long-running service) starts without unpickling anything and scores a batch with a few
+# array operations. The scores match the pipeline's decision_function; check with
+#     python compact_model.py --check --db example.db
+
+COMPACT_DIR = "event_classifier_compact"
+
+def term_hash(term):
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+def export(pipeline, version, directory=COMPACT_DIR):
+    """Writes the arrays and metadata for a fitted make_pipeline(TfidfVectorizer(), LogisticRegression())."""
+    vectorizer, classifier = pipeline.steps[0][1], pipeline.steps[-1][1]
+    if (vectorizer.analyzer != "word" or vectorizer.ngram_range != (1, 1) or vectorizer.tokenizer is not None
+            or vectorizer.preprocessor is not None or vectorizer.stop_words is not None or vectorizer.strip_accents is not None
+            or len(classifier.classes_) != 2):
+        raise ValueError("compact export only supports word unigram TF-IDF with a binary classifier")
+
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    hashes = np.array([term_hash(term) for term in terms], dtype=np.int64)
+    if len(np.unique(hashes)) != len(hashes):
+        raise ValueError("vocabulary hash collision")
+    order = np.argsort(hashes)
+
+    idf = vectorizer.idf_ if vectorizer.use_idf else np.ones(len(terms))
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "term_hashes.npy"), hashes[order])
+    np.save(os.path.join(directory, "idf.npy"), idf[order].astype(np.float64))
+    np.save(os.path.join(directory, "coef.npy"), classifier.coef_[0][order].astype(np.float64))
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({
+            "model_version": version,
+            "token_pattern": vectorizer.token_pattern,
+            "lowercase": vectorizer.lowercase,
+            "sublinear_tf": vectorizer.sublinear_tf,
+            "binary": vectorizer.binary,
+            "norm": vectorizer.norm,
+            "intercept": float(classifier.intercept_[0]),
+            "classes": [int(label) for label in classifier.classes_],
+        }, f, indent=4)
+
+class CompactClassifier:
+    """Pure-NumPy scorer over the exported arrays; predict() mirrors the sklearn pipeline's."""
+    def __init__(self, directory=COMPACT_DIR):
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.version = self.meta["model_version"]
+        self.token_pattern = re.compile(self.meta["token_pattern"])
+        self.hashes = np.load(os.path.join(directory, "term_hashes.npy"), mmap_mode="r")
+        self.idf = np.load(os.path.join(directory, "idf.npy"), mmap_mode="r")
+        self.coef = np.load(os.path.join(directory, "coef.npy"), mmap_mode="r")
+
+    def features(self, texts):
+        """(doc index, term index, count) of every vocabulary term in every text, as a sparse triple of arrays."""
+        docs, tokens = [], []
+        for i, text in enumerate(texts):
+            words = self.token_pattern.findall(text.lower() if self.meta["lowercase"] else text)
+            docs += [i] * len(words)
+            tokens += [term_hash(word) for word in words]
+        docs = np.array(docs, dtype=np.int64)
+        tokens = np.array(tokens, dtype=np.int64)
+
+        positions = np.searchsorted(self.hashes, tokens)
+        positions[positions == len(self.hashes)] = 0
+        known = self.hashes[positions] == tokens
+        pairs, counts = np.unique(np.stack([docs[known], positions[known]]), axis=1, return_counts=True)
+        return pairs[0], pairs[1], counts.astype(np.float64)
+
+    def decision_function(self, texts):
+        texts = list(texts)
+        docs, terms, tf = self.features(texts)
+        if self.meta["binary"]:
+            tf = np.minimum(tf, 1)
+        elif self.meta["sublinear_tf"]:
+            tf = 1 + np.log(tf)
+        weights = tf * self.idf[terms]
+
+        scores = np.bincount(docs, weights=weights * self.coef[terms], minlength=len(texts))
+        if self.meta["norm"] == "l2":
+            norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=len(texts)))
+        elif self.meta["norm"] == "l1":
+            norms = np.bincount(docs, weights=np.abs(weights), minlength=len(texts))
+        else:
+            norms = np.ones(len(texts))
+        norms[norms == 0] = 1
+        return scores / norms + self.meta["intercept"]
+
+    def predict(self, texts):
+        classes = np.array(self.meta["classes"])
+        return classes[(self.decision_function(texts) > 0).astype(int)]
+
+def load(directory=COMPACT_DIR, version=None):
+    """The compact classifier if it exists and was exported from the given pickle version, else None."""
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        return None
+    classifier = CompactClassifier(directory)
+    if version is not None and classifier.version != version:
+        return None
+    return classifier
+
+def main():
+    import time
+    import joblib
+    import email_store
+
+    arg_parser = argparse.ArgumentParser(description="Export the compact classifier, or check it against the sklearn pipeline.")
+    arg_parser.add_argument("--model", default="event_classifier.pkl")
+    arg_parser.add_argument("--dir", default=COMPACT_DIR)
+    arg_parser.add_argument("--check", action="store_true", help="compare scores with the pickled pipeline on every email in --db")
+    arg_parser.add_argument("--db", default=email_store.DB_NAME)
+    args = arg_parser.parse_args()
+
+    with open(args.model, "rb") as f:
+        version = hashlib.sha1(f.read()).hexdigest()[:12]
+
+    started = time.perf_counter()
+    pipeline = joblib.load(args.model)
+    pickle_seconds = time.perf_counter() - started
+
+    if not args.check:
+        export(pipeline, version, args.dir)
+        print(f"Exported '{args.model}' (model {version}) to '{args.dir}'.")
+        return
+
+    started = time.perf_counter()
+    compact = CompactClassifier(args.dir)
+    compact_seconds = time.perf_counter() - started
+    if compact.version != version:
+        print(f"Warning: '{args.dir}' was exported from model {compact.version}, not {version}.")
+
+    conn = email_store.connect(args.db)
+    texts = [(subject or "") + " " + (body or "") for subject, body in conn.execute("SELECT subject, body FROM emails")]
+    conn.close()
+
+    expected = pipeline.decision_function(texts)
+    got = compact.decision_function(texts)
+    agree = int(np.sum(pipeline.predict(texts) == compact.predict(texts)))
+    print(f"{len(texts)} emails: max score difference {np.max(np.abs(expected - got)) if texts else 0:.2e}, "
+          f"same prediction for {agree}/{len(texts)}")
+    print(f"Load time: pickle {pickle_seconds * 1000:.1f} ms, compact {compact_seconds * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import re
+from email.utils import parsedate_to_datetime
+from datetime import timezone
+from dateutil import parser
+from bs4 import BeautifulSoup
+from email_store import LOCAL_TZ
+from event_markup import parse_ics, parse_event_markup
+
+# Parsing helpers shared by the Outlook scraper (02_extract_parse_emails.py)
+# and the offline ingestion mode (02b_ingest_local_mail.py).
+
+# Fastest available HTML text extraction: selectolax, then lxml, then BeautifulSoup's html.parser
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+try:
+    import lxml.html
+    from lxml.etree import ParserError
+except ImportError:
+    lxml = None
+
+CALENDAR_TYPES = ("text/calendar", "application/ics")
+
+SENT_PATTERN = re.compile(r"Sent:\s*(.+?)\s*To:")
+# Split right before the "From: ..." section, which usually starts a quoted reply
+REPLY_PATTERN = re.compile(r'(?=From:.+)', flags=re.MULTILINE)
+REPLY_DATE_PATTERN = re.compile(r'^On (.+?) wrote:', re.MULTILINE)
+ANGLE_BRACKETS = re.compile(r'<.*?>')
+
+def strip_leading_headers(segment, subject):
+    """
+    Removes everything up to and including the Subject: ...<actual subject> part.
+    Only applies if the subject is found.
+    """
+    if not subject:
+        return segment.strip()
+    
+    # Escape special characters in subject for regex
+    escaped_subject = re.escape(subject)
+    
+    # Look for the full subject line
+    match = re.search(rf"Subject:\s*{escaped_subject}", segment)
+    if match:
+        # Remove everything up to the end of the Subject line
+        return segment[match.end():].strip()
+    
+    return segment.strip()
+
+def date_from_headers(segment):
+    """
+    Extracts and parses the datetime from a 'Sent: ...' line that is followed by 'To:'.
+    Returns an ISO formatted datetime string or None.
+    """
+    match = SENT_PATTERN.search(segment)
+    if match:
+        raw_date = match.group(1).strip()
+        try:
+            dt = parser.parse(raw_date)
+            hour_str = dt.strftime('%I').lstrip('0') or '0'
+            return f"{dt.strftime('%a')} {dt.month}/{dt.day}/{dt.year} {hour_str}:{dt.strftime('%M %p')}"
+        except Exception:
+            return None
+    return None
+
+def format_email_header_date(date_str):
+    """
+    Convert an RFC 2822 date string (e.g. 'Fri, 09 May 2025 20:00:00 +0000')
+    to the format 'Fri 5/9/2025 8:00 PM'.
+    """
+    try:
+        dt = parsedate_to_datetime(date_str)
+        hour_str = dt.strftime('%I').lstrip('0') or '0'
+        return f"{dt.strftime('%a')} {dt.month}/{dt.day}/{dt.year} {hour_str}:{dt.strftime('%M %p')}"
+    except Exception:
+        return date_str  # fallback to original if parsing fails
+
+def decode_part(part):
+    return part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="replace")
+
+def get_body(msg, events=None):
+    """
+    Returns the message text (cleaned HTML part if there is one, else the plain text part).
+    If events is a list, structured event candidates from text/calendar parts and from
+    schema.org markup in the HTML are appended to it (see event_markup.py).
+    """
+    if msg.is_multipart():
+        # One walk picks the parts; only the one that becomes the body is decoded
+        plain_part = html_part = None
+        for part in msg.walk():
+            content_type = part.get_content_type()
+
+            # Invites are often sent as an .ics attachment, so keep those too
+            if content_type in CALENDAR_TYPES:
+                if events is not None:
+                    events.extend(parse_ics(decode_part(part)))
+                continue
+            if html_part is not None or content_type not in ("text/plain", "text/html"):
+                continue
+            if "attachment" in str(part.get("Content-Disposition")):
+                continue
+            if content_type == "text/html":
+                html_part = part
+            else:
+                plain_part = part
+
+        if html_part is not None:
+            html = decode_part(html_part)
+            if events is not None:
+                events.extend(parse_event_markup(html))
+            return clean_html(html)
+        return decode_part(plain_part) if plain_part is not None else ""
+    else:
+        body = decode_part(msg)
+        if msg.get_content_type() in CALENDAR_TYPES and events is not None:
+            events.extend(parse_ics(body))
+        if "html" in msg.get_content_type().lower():
+            if events is not None:
+                events.extend(parse_event_markup(body))
+            body = clean_html(body)
+        return body
+
+def html_text_selectolax(html_content):
+    tree = HTMLParser(html_content)
+    for node in tree.css("script, style"):
+        node.decompose()
+    return tree.root.text(separator="") if tree.root is not None else ""
+
+def html_text_lxml(html_content):
+    try:
+        doc = lxml.html.document_fromstring(html_content)
+    except (ParserError, ValueError):
+        # Empty documents, or str input with an XML encoding declaration
+        return html_text_bs4(html_content)
+    for element in doc.xpath("//script|//style"):
+        element.drop_tree()
+    return doc.text_content()
+
+def html_text_bs4(html_content):
+    soup = BeautifulSoup(html_content, "html.parser")
+    for script_or_style in soup(['script', 'style']):
+        script_or_style.decompose()
+    return soup.get_text()
+
+HTML_BACKENDS = {"bs4": html_text_bs4}
+if lxml is not None:
+    HTML_BACKENDS["lxml"] = html_text_lxml
+if HTMLParser is not None:
+    HTML_BACKENDS["selectolax"] = html_text_selectolax
+HTML_BACKEND = next(name for name in ("selectolax", "lxml", "bs4") if name in HTML_BACKENDS)
+
+def clean_html(html_content, backend=None):
+    """Visible text of an HTML document (scripts and styles dropped) with whitespace collapsed."""
+    return ' '.join(HTML_BACKENDS[backend or HTML_BACKEND](html_content).split())
+
+def split_replies(body):
+    # Split the body text where the patterns match
+    split_body = REPLY_PATTERN.split(body)
+    
+    # Return the cleaned split body (without leading empty strings)
+    return [part.strip() for part in split_body if part.strip()]
+
+
+def extract_reply_date(text):
+    # Try to extract datetime from a line like "On Mon, Apr 1, 2024 at 5:12 PM John Doe <jdoe@example.com> wrote:"
+    match = REPLY_DATE_PATTERN.search(text)
+    if match:
+        raw_date = match.group(1)
+        try:
+            # Strip email addresses to improve parse accuracy
+            raw_date = ANGLE_BRACKETS.sub('', raw_date)
+            dt = parsedate_to_datetime(raw_date)
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt.isoformat()
+        except Exception:
+            return None
+    return None
+
+
+def parse_email_date(date_str):
+    try:
+        dt = parsedate_to_datetime(date_str)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt
+    except Exception:
+        return None
+
+
+def format_outlook_date(dt):
+    """Format a datetime the way Outlook shows it, e.g. 'Fri 5/9/2025 8:00 PM'."""
+    hour_str = dt.strftime('%I').lstrip('0') or '0'
+    return f"{dt.strftime('%a')} {dt.month}/{dt.day}/{dt.year} {hour_str}:{dt.strftime('%M %p')}"
+
+def message_datetime(msg):
+    """
+    Returns the local (US/Eastern) datetime of a message from its headers,
+    preferring 'X-Mailman-Approved-At' over 'Date'. None if neither parses.
+    """
+    for header in ("X-Mailman-Approved-At", "Date"):
+        dt = parse_email_date(str(msg.get(header) or ""))
+        if dt is not None:
+            return dt.astimezone(LOCAL_TZ)
+    return None
+
+def build_parsed_email(subject, sender, dt, body, events=None):
+    """
+    Splits replies off a plain-text body and returns the original message
+    as a dict in the parsed_emails.json layout. Event candidates, if any, go under "events".
+    """
+    split_messages = split_replies(body) or [""]
+
+    i = len(split_messages) - 1
+    segment = split_messages[-1]
+
+    # Adjust subject
+    final_subject = subject if i == 0 and not subject.startswith("Re: ") else subject[4:]
+
+    if i == 0:
+        cleaned_segment = segment.strip()
+    else:
+        cleaned_segment = strip_leading_headers(segment, final_subject)
+
+    parsed = {
+        "subject": final_subject,
+        "from": sender,
+        "date": format_outlook_date(dt.astimezone(LOCAL_TZ)),
+        "body": cleaned_segment
+    }
+    if events:
+        parsed["events"] = events
+    return parsed
+
+def parse_message(msg):
+    """
+    Offline counterpart of extract_email_data in 02_extract_parse_emails.py:
+    the date comes from the message headers instead of the Outlook reading pane.
+    Returns a dict in the parsed_emails.json layout, or None if the message has no usable date.
+    """
+    dt = message_datetime(msg)
+    if dt is None:
+        return None
+    events = []
+    body = get_body(msg, events)
+    parsed = build_parsed_email(str(msg.get("subject", "") or ""), str(msg.get("from", "") or ""), dt, body, events)
+    if msg.get("List-Id"):
+        parsed["list_id"] = str(msg.get("List-Id"))
+    return parsed
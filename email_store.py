@@ -0,0 +1,419 @@
+import json
+import hashlib
+import sqlite3
+import pytz
+from datetime import datetime
+from dateutil import parser
+import metrics
+
+# The single emails.db database shared by every stage. Each table is keyed by email id:
+#   emails      - parsed emails (02 streaming while it scrapes, 02b offline ingestion, 03 from parsed_emails.json)
+#   labels      - manual is_event labels (04), used for training (05); seq orders them for incremental training (05b)
+#   model_versions - every trained classifier, with its holdout scores and whether it became event_classifier.pkl
+#   predictions - classifier output (06), including sender/list verdicts (see verdict_cache.py)
+#   event_info  - fields extracted by the LLM (07)
+#   event_links - email -> the event_info row describing its event (near-duplicates share one; see near_duplicates.py)
+#   event_candidates - events read from calendar invites / schema.org markup while parsing (see event_markup.py)
+# migrate_databases.py imports the older emails_labeled.db / emails_events.db / events_info.db copies.
+
+DB_NAME = "emails.db"
+BATCH_SIZE = 50
+HOLDOUT_PERCENT = 20  # Labels never trained on (by 05 or 05b), so model versions can be compared on them
+
+# Outlook displays times in US/Eastern, e.g. 'Wed 5/14/2025 6:19 PM'
+LOCAL_TZ = pytz.timezone("US/Eastern")
+DATE_FORMAT = "%a %m/%d/%Y %I:%M %p"
+
+def parse_date(date_str):
+    """Convert 'Wed 5/14/2025 6:19 PM' to '2025-05-14 18:19:00'"""
+    try:
+        dt = datetime.strptime(date_str, DATE_FORMAT)
+        return dt.strftime("%Y-%m-%d %H:%M:%S")
+    except Exception:
+        return date_str  # fallback if parsing fails
+
+def to_timestamp(date_str):
+    """
+    Normalize any date string found in emails.date (stored '2025-05-14 18:19:00', Outlook style,
+    or a raw header date) to (UTC epoch seconds, timezone name). Naive times are US/Eastern.
+    Returns (None, None) if the string can't be parsed.
+    """
+    if not date_str:
+        return None, None
+    try:
+        dt = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        try:
+            dt = datetime.strptime(date_str, DATE_FORMAT)
+        except ValueError:
+            try:
+                dt = parser.parse(date_str)
+            except (ValueError, OverflowError):
+                return None, None
+
+    if dt.tzinfo is None:
+        dt = LOCAL_TZ.localize(dt)
+        tz_name = LOCAL_TZ.zone
+    else:
+        tz_name = dt.strftime("%z") or "UTC"
+    return int(dt.timestamp()), tz_name
+
+def connect(db_name=DB_NAME):
+    conn = sqlite3.connect(db_name)
+    # WAL lets one stage write while another reads
+    conn.execute("PRAGMA journal_mode=WAL")
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS emails (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject TEXT,
+            sender TEXT,
+            date TEXT,
+            body TEXT,
+            dedup_key TEXT,
+            received_at INTEGER,
+            tz TEXT,
+            list_id TEXT
+        )
+    ''')
+    add_dedup_keys(conn)
+    add_timestamps(conn)
+    if "list_id" not in [row[1] for row in cursor.execute("PRAGMA table_info(emails)")]:
+        # Mailing list the email came through (List-Id header), when the parser saw one
+        cursor.execute("ALTER TABLE emails ADD COLUMN list_id TEXT")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS labels (
+            email_id INTEGER PRIMARY KEY REFERENCES emails(id),
+            is_event INTEGER NOT NULL,
+            seq INTEGER
+        )
+    ''')
+    add_label_seq(conn)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS model_versions (
+            version TEXT PRIMARY KEY,
+            kind TEXT,
+            path TEXT,
+            created_at TEXT,
+            last_label_seq INTEGER,
+            trained_labels INTEGER,
+            events_seen INTEGER,
+            holdout_size INTEGER,
+            holdout_f1 REAL,
+            baseline_f1 REAL,
+            promoted INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS predictions (
+            email_id INTEGER PRIMARY KEY REFERENCES emails(id),
+            is_event INTEGER NOT NULL,
+            model_version TEXT,
+            source TEXT
+        )
+    ''')
+    prediction_columns = [row[1] for row in cursor.execute("PRAGMA table_info(predictions)")]
+    if "model_version" not in prediction_columns:
+        cursor.execute("ALTER TABLE predictions ADD COLUMN model_version TEXT")
+    if "source" not in prediction_columns:
+        # Which level of 06's cascade decided: 'list', 'sender' or 'model' (NULL for older rows)
+        cursor.execute("ALTER TABLE predictions ADD COLUMN source TEXT")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS event_info (
+            email_id INTEGER PRIMARY KEY REFERENCES emails(id),
+            event_name TEXT,
+            description TEXT,
+            location TEXT,
+            date TEXT,
+            registration_required TEXT,
+            food_provided TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS event_links (
+            email_id INTEGER PRIMARY KEY REFERENCES emails(id),
+            event_id INTEGER NOT NULL REFERENCES event_info(email_id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_event_links_event ON event_links(event_id)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS event_candidates (
+            email_id INTEGER REFERENCES emails(id),
+            source TEXT,
+            event_name TEXT,
+            description TEXT,
+            location TEXT,
+            date TEXT,
+            starts_at INTEGER
+        )
+    ''')
+    add_candidate_index(conn)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_labels_is_event ON labels(is_event)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_predictions_is_event ON predictions(is_event)")
+
+    # Checkpoints so an interrupted scrape resumes where it stopped
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scrape_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            threshold TEXT,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS processed_conversations (
+            conversation_id TEXT PRIMARY KEY,
+            run_id INTEGER
+        )
+    ''')
+    conn.commit()
+    return conn
+
+def unfinished_run(conn):
+    """Returns (run_id, threshold) of the last run that never finished, or None."""
+    return conn.execute(
+        "SELECT id, threshold FROM scrape_runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+
+def start_run(conn, threshold):
+    cursor = conn.execute("INSERT INTO scrape_runs (threshold, started_at) VALUES (?, ?)",
+                          (threshold, datetime.now().isoformat(timespec="seconds")))
+    conn.commit()
+    return cursor.lastrowid
+
+def finish_run(conn, run_id):
+    with conn:
+        conn.execute("UPDATE scrape_runs SET finished_at = ? WHERE id = ?",
+                     (datetime.now().isoformat(timespec="seconds"), run_id))
+        # The checkpoint only matters while a run can be resumed; the next run starts from its own threshold
+        conn.execute('''
+            DELETE FROM processed_conversations
+            WHERE run_id IS NULL OR run_id NOT IN (SELECT id FROM scrape_runs WHERE finished_at IS NULL)
+        ''')
+
+def processed_conversation_ids(conn, run_id):
+    """Conversations already handled by the (interrupted) run being resumed."""
+    return {row[0] for row in conn.execute("SELECT conversation_id FROM processed_conversations WHERE run_id = ?", (run_id,))}
+
+def dedup_key(sender, date, body):
+    """
+    Stable key for an email: a hash of sender, date and body. Computed the same way for
+    new items and for rows already in the database (parse_date leaves stored dates unchanged),
+    so emails ingested before the key existed are matched too.
+    """
+    text = "\x1f".join([sender or "", parse_date(date or ""), body or ""])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def add_dedup_keys(conn):
+    """Adds and backfills the dedup_key column on older databases, then enforces it with a unique index."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(emails)")]
+    if "dedup_key" not in columns:
+        conn.execute("ALTER TABLE emails ADD COLUMN dedup_key TEXT")
+
+    rows = conn.execute("SELECT id, sender, date, body FROM emails WHERE dedup_key IS NULL").fetchall()
+    if rows:
+        conn.executemany("UPDATE emails SET dedup_key = ? WHERE id = ?",
+                         [(dedup_key(sender, date, body), id_) for id_, sender, date, body in rows])
+    conn.commit()
+
+    try:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_emails_dedup_key ON emails(dedup_key)")
+    except sqlite3.IntegrityError:
+        # Overlapping runs used to insert the same email twice; merging them touches labels and
+        # predictions, so it is left to an explicit migration rather than done behind every connect
+        print("Warning: the database holds duplicate emails from before dedup_key existed; "
+              "run migrate_databases.py to merge them.")
+    conn.commit()
+
+# Columns holding an email id, repointed when duplicate emails are merged (tables that don't exist are skipped)
+EMAIL_REFERENCES = [
+    ("labels", "email_id"), ("predictions", "email_id"), ("event_info", "email_id"),
+    ("event_links", "email_id"), ("event_links", "event_id"), ("event_candidates", "email_id"),
+    ("email_clusters", "email_id"), ("email_clusters", "cluster_id"), ("minhash_bands", "email_id"),
+]
+
+def merge_duplicate_emails(conn):
+    """
+    Keeps the first copy of every email stored more than once. Rows pointing at a later copy
+    are moved to the first one (unless it already has such a row, which wins), then the later
+    copies are deleted. Returns how many emails were removed.
+    """
+    duplicates = conn.execute('''
+        SELECT e.id, k.keep_id FROM emails e
+        JOIN (SELECT dedup_key, MIN(id) AS keep_id FROM emails GROUP BY dedup_key) k ON k.dedup_key = e.dedup_key
+        WHERE e.id != k.keep_id
+    ''').fetchall()
+    if not duplicates:
+        return 0
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    with conn:
+        for table, column in EMAIL_REFERENCES:
+            if table in tables:
+                conn.executemany(f"UPDATE OR IGNORE {table} SET {column} = ? WHERE {column} = ?",
+                                 [(keep_id, id_) for id_, keep_id in duplicates])
+                conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(id_,) for id_, _ in duplicates])
+        conn.executemany("DELETE FROM emails WHERE id = ?", [(id_,) for id_, _ in duplicates])
+    return len(duplicates)
+
+def add_timestamps(conn):
+    """
+    Adds received_at (UTC epoch seconds) and tz to older databases and fills them from the date text,
+    so range scans and ordering use an integer index instead of comparing date strings.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(emails)")]
+    if "received_at" not in columns:
+        conn.execute("ALTER TABLE emails ADD COLUMN received_at INTEGER")
+        conn.execute("ALTER TABLE emails ADD COLUMN tz TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_emails_received_at ON emails(received_at)")
+
+    rows = conn.execute("SELECT id, date FROM emails WHERE received_at IS NULL").fetchall()
+    updates = [to_timestamp(date) + (id_,) for id_, date in rows]
+    updates = [update for update in updates if update[0] is not None]
+    if updates:
+        conn.executemany("UPDATE emails SET received_at = ?, tz = ? WHERE id = ?", updates)
+    conn.commit()
+
+def add_label_seq(conn):
+    """
+    Adds labels.seq to older databases and numbers labels that have none (older rows, or
+    rows imported by migrate_databases.py) after the existing ones, in email id order.
+    """
+    if "seq" not in [row[1] for row in conn.execute("PRAGMA table_info(labels)")]:
+        conn.execute("ALTER TABLE labels ADD COLUMN seq INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_labels_seq ON labels(seq)")
+    start = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM labels").fetchone()[0]
+    ids = [row[0] for row in conn.execute("SELECT email_id FROM labels WHERE seq IS NULL ORDER BY email_id")]
+    if ids:
+        conn.executemany("UPDATE labels SET seq = ? WHERE email_id = ?", [(start + i + 1, id_) for i, id_ in enumerate(ids)])
+    conn.commit()
+
+def in_holdout(email_id):
+    # Fixed by email id, so an email is in the holdout on every run
+    return int(hashlib.sha1(str(email_id).encode()).hexdigest(), 16) % 100 < HOLDOUT_PERCENT
+
+def add_candidate_index(conn):
+    """
+    One event_candidates row per email, source, name and start. A UNIQUE constraint treats NULLs
+    as distinct, so an invite without a name or start time was stored again on every re-ingest;
+    the index compares them as '' / -1 instead. Older databases are deduplicated first.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_event_candidates_unique'").fetchone():
+        return
+    conn.execute('''
+        DELETE FROM event_candidates WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM event_candidates
+            GROUP BY email_id, COALESCE(source, ''), COALESCE(event_name, ''), COALESCE(starts_at, -1)
+        )
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX idx_event_candidates_unique ON event_candidates
+        (email_id, COALESCE(source, ''), COALESCE(event_name, ''), COALESCE(starts_at, -1))
+    ''')
+    conn.commit()
+
+def save_label(conn, email_id, is_event):
+    """Stores (or replaces) a label with the next seq, so incremental training picks it up."""
+    conn.execute('''
+        INSERT OR REPLACE INTO labels (email_id, is_event, seq)
+        VALUES (?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM labels))
+    ''', (email_id, is_event))
+    conn.commit()
+
+def record_model_version(conn, version, kind, path, **fields):
+    """Adds a row to model_versions; fields are any of its other columns."""
+    columns = ["version", "kind", "path", "created_at"] + list(fields)
+    values = [version, kind, path, datetime.now().isoformat(timespec="seconds")] + list(fields.values())
+    conn.execute(f"INSERT OR REPLACE INTO model_versions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", values)
+    conn.commit()
+
+def latest_received_at(conn):
+    """Newest email time as an aware US/Eastern datetime, or None for an empty database."""
+    row = conn.execute("SELECT MAX(received_at) FROM emails").fetchone()
+    if row[0] is None:
+        return None
+    return datetime.fromtimestamp(row[0], LOCAL_TZ)
+
+def candidate_row(email_id, event):
+    return (email_id, event.get("source"), event.get("event_name"), event.get("description"),
+            event.get("location"), event.get("date"), event.get("starts_at"))
+
+def email_row(item):
+    date = parse_date(item.get("date", ""))
+    return (item.get("subject", ""), item.get("from", ""), date, item.get("body", ""),
+            dedup_key(item.get("from", ""), item.get("date", ""), item.get("body", ""))) + to_timestamp(date) + (item.get("list_id"),)
+
+class EmailWriter:
+    """
+    Buffers parsed emails and writes them to the emails table in batched transactions.
+    Conversation ids are checkpointed in the same transaction as their emails,
+    and an item's "events" (structured event candidates) go to event_candidates.
+    """
+    def __init__(self, conn, run_id=None, batch_size=BATCH_SIZE):
+        self.conn = conn
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.rows = []
+        self.conversation_ids = []
+        self.events = []
+        self.count = 0
+        self.inserted = 0
+
+    def add(self, item, conversation_id=None):
+        row = email_row(item)
+        self.rows.append(row)
+        self.events += [(row[4], event) for event in item.get("events", [])]
+        self.count += 1
+        self.mark_processed(conversation_id)
+
+    def mark_processed(self, conversation_id):
+        if conversation_id:
+            self.conversation_ids.append((conversation_id, self.run_id))
+        if len(self.rows) + len(self.conversation_ids) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with metrics.span("db_flush"), self.conn:
+            # Emails already stored (same dedup key) are skipped, so re-ingesting an overlapping window is free
+            cursor = self.conn.executemany('''
+                INSERT INTO emails (subject, sender, date, body, dedup_key, received_at, tz, list_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(dedup_key) DO NOTHING
+            ''', self.rows)
+            self.inserted += max(cursor.rowcount, 0)
+            metrics.count("rows_inserted", max(cursor.rowcount, 0))
+            if self.events:
+                keys = list({key for key, _ in self.events})
+                ids = dict(self.conn.execute(
+                    f"SELECT dedup_key, id FROM emails WHERE dedup_key IN ({','.join('?' * len(keys))})", keys))
+                self.conn.executemany('''
+                    INSERT OR IGNORE INTO event_candidates
+                    (email_id, source, event_name, description, location, date, starts_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', [candidate_row(ids[key], event) for key, event in self.events if key in ids])
+            self.conn.executemany("INSERT OR IGNORE INTO processed_conversations (conversation_id, run_id) VALUES (?, ?)",
+                                  self.conversation_ids)
+        self.rows = []
+        self.conversation_ids = []
+        self.events = []
+
+    def close(self):
+        self.flush()
+
+class JsonEmailWriter:
+    """Same interface as EmailWriter, but collects emails and writes a parsed_emails.json file on close."""
+    def __init__(self, path):
+        self.path = path
+        self.emails = []
+        self.count = 0
+
+    def add(self, item, conversation_id=None):
+        self.emails.append(item)
+        self.count += 1
+
+    def mark_processed(self, conversation_id):
+        pass
+
+    def close(self):
+        # Sort emails by date, most recent first
+        self.emails.sort(key=lambda email: to_timestamp(parse_date(email.get("date", "")))[0] or 0, reverse=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.emails, f, indent=4, ensure_ascii=False)
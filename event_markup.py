@@ -0,0 +1,189 @@
+import re
+import json
+import pytz
+from datetime import datetime
+from dateutil import parser
+from bs4 import BeautifulSoup
+from email_store import LOCAL_TZ
+
+# Structured event data that some emails already carry: text/calendar (.ics) invite parts
+# and schema.org Event markup (JSON-LD or microdata) in the HTML. email_parsing.get_body
+# collects these as event candidates, email_store keeps them in the event_candidates table,
+# and 07_extract_event_info.py fills event_info from them without asking the LLM.
+#
+# A candidate is a dict with the event_info fields that were found (event_name, description,
+# location, date), plus source ("ics" or "schema.org") and starts_at (UTC epoch seconds or None).
+
+ICS_ESCAPES = re.compile(r"\\([\\;,nN])")
+EVENT_TYPE = re.compile(r"(?:^|/)\w*Event$")
+
+def ics_unescape(value):
+    return ICS_ESCAPES.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value).strip()
+
+def ics_properties(text):
+    """Yields (name, params, value) for each unfolded content line of an iCalendar text."""
+    unfolded = re.sub(r"\r?\n[ \t]", "", text)
+    for line in unfolded.splitlines():
+        name_part, sep, value = line.partition(":")
+        if not sep:
+            continue
+        name, *params = name_part.split(";")
+        params = dict(param.partition("=")[::2] for param in params)
+        yield name.upper(), {key.upper(): val.strip('"') for key, val in params.items()}, value
+
+def ics_datetime(value, params):
+    """Parses a DTSTART/DTEND value into an aware datetime, or a date for all-day events."""
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or re.fullmatch(r"\d{8}", value):
+        return datetime.strptime(value[:8], "%Y%m%d").date()
+    dt = datetime.strptime(value.rstrip("Z")[:15], "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return pytz.utc.localize(dt)
+    try:
+        return pytz.timezone(params["TZID"]).localize(dt)
+    except (KeyError, pytz.UnknownTimeZoneError):
+        # Floating time or an Outlook zone name pytz doesn't know: treat as local
+        return LOCAL_TZ.localize(dt)
+
+def describe_when(start, end=None):
+    """'Thursday, June 12, 2025 at 6:00 PM - 7:30 PM' in US/Eastern, matching event_info's natural-language dates."""
+    if not isinstance(start, datetime):
+        return f"{start.strftime('%A, %B')} {start.day}, {start.year}"
+    start = start.astimezone(LOCAL_TZ)
+    text = f"{start.strftime('%A, %B')} {start.day}, {start.year} at {clock(start)}"
+    if isinstance(end, datetime):
+        end = end.astimezone(LOCAL_TZ)
+        text += f" - {clock(end)}" if end.date() == start.date() else f" - {describe_when(end)}"
+    return text
+
+def clock(dt):
+    return f"{dt.strftime('%I').lstrip('0')}:{dt.strftime('%M %p')}"
+
+def epoch(start):
+    if start is None:
+        return None
+    if not isinstance(start, datetime):
+        start = LOCAL_TZ.localize(datetime(start.year, start.month, start.day))
+    return int(start.timestamp())
+
+def candidate(source, name, description, location, start, end):
+    found = {"source": source, "starts_at": epoch(start)}
+    for field, value in (("event_name", name), ("description", description), ("location", location)):
+        if value:
+            found[field] = " ".join(str(value).split())
+    if start is not None:
+        found["date"] = describe_when(start, end)
+    return found
+
+def parse_ics(text):
+    """Returns a candidate per VEVENT in an iCalendar text. Cancellations yield nothing."""
+    candidates = []
+    event = None
+    method = ""
+    for name, params, value in ics_properties(text or ""):
+        if name == "METHOD":
+            method = value.strip().upper()
+        elif name == "BEGIN" and value.strip().upper() == "VEVENT":
+            event = {}
+        elif name == "END" and value.strip().upper() == "VEVENT" and event is not None:
+            if method != "CANCEL" and event.get("STATUS", "").upper() != "CANCELLED":
+                candidates.append(candidate("ics", event.get("SUMMARY"), event.get("DESCRIPTION"),
+                                            event.get("LOCATION"), event.get("DTSTART"), event.get("DTEND")))
+            event = None
+        elif event is not None and name in ("DTSTART", "DTEND"):
+            try:
+                event[name] = ics_datetime(value, params)
+            except ValueError:
+                pass
+        elif event is not None and name in ("SUMMARY", "DESCRIPTION", "LOCATION", "STATUS"):
+            event[name] = ics_unescape(value)
+    return candidates
+
+def schema_datetime(value):
+    if not value:
+        return None
+    try:
+        dt = parser.isoparse(str(value).strip())
+    except (ValueError, OverflowError):
+        return None
+    if isinstance(dt, datetime) and len(str(value).strip()) <= 10:
+        return dt.date()
+    if dt.tzinfo is None:
+        dt = LOCAL_TZ.localize(dt)
+    return dt
+
+def schema_location(location):
+    """Place / PostalAddress / VirtualLocation objects (or plain strings) as one line of text."""
+    if isinstance(location, list):
+        return "; ".join(filter(None, (schema_location(item) for item in location)))
+    if not isinstance(location, dict):
+        return location or None
+    if "VirtualLocation" in str(location.get("@type", "")):
+        return f"Online ({location['url']})" if location.get("url") else "Online"
+    parts = [location.get("name")]
+    address = location.get("address")
+    if isinstance(address, dict):
+        parts += [address.get("streetAddress"), address.get("addressLocality")]
+    else:
+        parts.append(address)
+    return ", ".join(str(part) for part in parts if part) or None
+
+def is_event_type(value):
+    types = value if isinstance(value, list) else [value]
+    return any(EVENT_TYPE.search(str(type_)) for type_ in types if type_)
+
+def json_ld_events(data):
+    """Yields Event objects from a JSON-LD document (object, list or @graph)."""
+    if isinstance(data, list):
+        for item in data:
+            yield from json_ld_events(item)
+    elif isinstance(data, dict):
+        if is_event_type(data.get("@type")):
+            yield data
+        if "@graph" in data:
+            yield from json_ld_events(data["@graph"])
+
+def microdata_value(element):
+    for attr in ("content", "datetime", "href"):
+        if element.get(attr):
+            return element[attr]
+    return " ".join(element.get_text().split())
+
+def parse_event_markup(html):
+    """Returns a candidate per schema.org Event found as JSON-LD or microdata in an HTML part."""
+    if not html or "schema.org" not in html and "application/ld+json" not in html:
+        return []
+    soup = BeautifulSoup(html, "html.parser")
+    candidates = []
+
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except json.JSONDecodeError:
+            continue
+        for event in json_ld_events(data):
+            candidates.append(candidate("schema.org", event.get("name"), event.get("description"),
+                                        schema_location(event.get("location")),
+                                        schema_datetime(event.get("startDate")), schema_datetime(event.get("endDate"))))
+
+    for scope in soup.find_all(itemscope=True, itemtype=EVENT_TYPE):
+        props = {}
+        for element in scope.find_all(itemprop=True):
+            # Only direct properties, not those of nested items such as the Place
+            if element.find_parent(itemscope=True) is scope:
+                props.setdefault(element["itemprop"], element)
+        location = props.get("location")
+        if location is not None and location.has_attr("itemscope"):
+            location = ", ".join(microdata_value(element) for element in location.find_all(itemprop=["name", "address"]))
+        elif location is not None:
+            location = microdata_value(location)
+        candidates.append(candidate(
+            "schema.org",
+            microdata_value(props["name"]) if "name" in props else None,
+            microdata_value(props["description"]) if "description" in props else None,
+            location,
+            schema_datetime(microdata_value(props["startDate"])) if "startDate" in props else None,
+            schema_datetime(microdata_value(props["endDate"])) if "endDate" in props else None,
+        ))
+
+    return [found for found in candidates if found.get("event_name") or found.get("date")]
@@ -0,0 +1,143 @@
+import re
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Deterministic stand-in for the Ollama HTTP API, so 07_extract_event_info.py can be run and
+# timed with no model: `python fake_ollama_server.py --port 11435`, then OLLAMA_HOST=127.0.0.1:11435.
+# /api/generate answers the extraction prompts of 07 (single emails and --batch arrays) with
+# JSON built from the prompt itself, streamed in small chunks and followed by chatter the
+# client should stop reading at. The same prompt always gets the same answer; --prompt-ms
+# and --token-ms add a fixed delay per 1000 prompt characters and per streamed chunk.
+
+CHUNK_CHARS = 4
+VALUES = {
+    "location": ["32-123", "Stata Center, 32-G449", "Walker Memorial", "Online (Zoom)", "unknown"],
+    "date": ["Friday at 5pm", "Tuesday, April 22 at 6:00 pm", "Thursday at noon", "unknown"],
+    "registration_required": ["yes", "no", "unknown"],
+    "food_provided": ["pizza", "light snacks", "catered dinner", "none", "unknown"],
+}
+
+def pick(field, text):
+    choices = VALUES[field]
+    return choices[int(hashlib.sha1(f"{field}\x1f{text}".encode("utf-8")).hexdigest(), 16) % len(choices)]
+
+def answer_fields(fields, subject, body):
+    answer = {}
+    for field in fields:
+        if field == "event_name":
+            answer[field] = subject.strip() or "unknown"
+        elif field == "description":
+            answer[field] = " ".join(body.split()[:25]) or "unknown"
+        else:
+            answer[field] = pick(field, subject + body)
+    return answer
+
+def answer(prompt):
+    """The JSON text a well-behaved model would return for one of 07's prompts."""
+    fields = [field for field in re.findall(r'^\s*"(\w+)": \[', prompt, re.M) if field != "email_id"]
+    emails = re.findall(r"Email ID: (\d+)\nEmail Subject:\n(.*?)\n\nEmail Body:\n(.*?)(?=\n\nEmail ID: |\n\nReturn a JSON array)",
+                        prompt, re.S)
+    if emails:
+        return json.dumps([dict(email_id=int(id_), **answer_fields(fields, subject, body)) for id_, subject, body in emails])
+    match = re.search(r"Email Subject:\n(.*?)\n\nEmail Body:\n(.*?)\n\nExtract and return", prompt, re.S)
+    subject, body = match.groups() if match else ("", prompt)
+    return json.dumps(answer_fields(fields, subject, body))
+
+def make_handler(model_name, prompt_ms, token_ms):
+    class OllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def handle(self):
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                # Clients close keep-alive connections, or hang up mid-stream after the closing brace
+                pass
+
+        def send_json(self, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            if self.path == "/":
+                data = b"Ollama is running"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            elif self.path == "/api/tags":
+                self.send_json({"models": [{"name": model_name, "model": model_name}]})
+            elif self.path == "/api/version":
+                self.send_json({"version": "0.0.0-fake"})
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path != "/api/generate":
+                self.send_error(404)
+                return
+
+            prompt = request.get("prompt", "")
+            model = request.get("model", model_name)
+            time.sleep(prompt_ms * len(prompt) / 1000 / 1000)
+            text = answer(prompt)
+            if request.get("format") != "json":
+                text += "\n\nLet me know if you need anything else!"
+
+            created_at = datetime.now(timezone.utc).isoformat()
+            done = {"model": model, "created_at": created_at, "response": "", "done": True, "done_reason": "stop",
+                    "prompt_eval_count": len(prompt) // 4, "eval_count": len(text) // CHUNK_CHARS}
+            if not request.get("stream", True):
+                time.sleep(token_ms * len(text) / CHUNK_CHARS / 1000)
+                self.send_json(dict(done, response=text))
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(text), CHUNK_CHARS):
+                time.sleep(token_ms / 1000)
+                self.write_chunk({"model": model, "created_at": created_at, "response": text[i:i + CHUNK_CHARS], "done": False})
+            self.write_chunk(done)
+            self.wfile.write(b"0\r\n\r\n")
+
+        def write_chunk(self, payload):
+            data = (json.dumps(payload) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return OllamaHandler
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Serve deterministic Ollama-style answers to 07's extraction prompts.")
+    arg_parser.add_argument("--port", type=int, default=11435)
+    arg_parser.add_argument("--model", default="llama3.2:1b")
+    arg_parser.add_argument("--prompt-ms", type=float, default=0, help="delay per 1000 prompt characters")
+    arg_parser.add_argument("--token-ms", type=float, default=0, help="delay per streamed chunk")
+    args = arg_parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.model, args.prompt_ms, args.token_ms))
+    print(f"Fake Ollama serving '{args.model}' at http://127.0.0.1:{args.port}", flush=True)
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Stops reading an LLM token stream as soon as the first complete top-level JSON value
+# has been produced, so small models don't spend decode time on trailing commentary.
+
+def first_json_value(chunks, opener="{"):
+    """
+    Consumes text chunks until the first top-level value starting with opener ('{' or '[')
+    is closed, tracking nesting depth and string/escape state.
+    Returns (text read so far, JSON text or None if the stream ended before the value closed).
+    """
+    read = []
+    value = []
+    depth = 0
+    in_string = escaped = False
+
+    for chunk in chunks:
+        read.append(chunk)
+        for char in chunk:
+            if depth == 0:
+                if char == opener:
+                    depth = 1
+                    value.append(char)
+                continue
+
+            value.append(char)
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            elif char in "}]":
+                depth -= 1
+                if depth == 0:
+                    return "".join(read), "".join(value)
+
+    return "".join(read), None
+
+def stream_json(llm, prompt, opener="{"):
+    """Streams a completion and closes the stream (ending generation) once the JSON value is complete."""
+    chunks = llm.stream(input=prompt)
+    try:
+        return first_json_value(chunks, opener)
+    finally:
+        chunks.close()
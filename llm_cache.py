@@ -0,0 +1,71 @@
+import json
+import time
+import hashlib
+
+# Persistent cache of LLM extraction results for 07_extract_event_info.py, stored in emails.db.
+# Entries are keyed by a hash of the model name, the prompt template version and the email text,
+# so re-runs (or 06 re-emitting the same event) never pay for the same inference twice.
+
+MAX_ENTRIES = 20000
+MAX_AGE_DAYS = 180
+
+def cache_key(model_name, prompt_version, *parts):
+    text = "\x1f".join([model_name, str(prompt_version)] + [part or "" for part in parts])
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """Raw output and parsed JSON per key, with LRU/age eviction and hit/miss counters."""
+    def __init__(self, conn, max_entries=MAX_ENTRIES, max_age_days=MAX_AGE_DAYS):
+        self.conn = conn
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                raw_output TEXT,
+                parsed TEXT,
+                created_at INTEGER,
+                last_used INTEGER,
+                hits INTEGER DEFAULT 0
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+        conn.commit()
+
+    def get(self, key):
+        """Returns the cached parsed dict, or None on a miss."""
+        row = self.conn.execute("SELECT parsed FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (int(time.time()), key))
+        self.conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, raw_output, parsed):
+        now = int(time.time())
+        self.conn.execute('''
+            INSERT OR REPLACE INTO llm_cache (key, raw_output, parsed, created_at, last_used, hits)
+            VALUES (?, ?, ?, ?, ?, 0)
+        ''', (key, raw_output, json.dumps(parsed, ensure_ascii=False), now, now))
+        self.conn.commit()
+
+    def evict(self):
+        """Drops entries unused for max_age_days, then the least recently used beyond max_entries."""
+        cutoff = int(time.time()) - self.max_age_days * 86400
+        with self.conn:
+            removed = self.conn.execute("DELETE FROM llm_cache WHERE last_used < ?", (cutoff,)).rowcount
+            removed += self.conn.execute('''
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,)).rowcount
+        return removed
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0
+        return f"LLM cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)"
@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import atexit
+import sqlite3
+import threading
+import contextlib
+
+# Lightweight instrumentation shared by the pipeline stages. A stage calls init("06_classify")
+# once, then records spans (timed blocks) and counters:
+#     with metrics.span("classifier_batch"): ...
+#     metrics.count("rows_inserted", n)
+# Values are aggregated in memory (thread-safe) and written as one row per name to the metrics
+# table of emails.db when the process exits or on each flush() (for long-running processes),
+# tagged with the pipeline run id (EVENTLIST_RUN_ID, set by 08_pipeline.py). If
+# EVENTLIST_METRICS_JSONL names a file, the rows are also appended there as JSON lines.
+#
+# With EVENTLIST_PROFILE=<dir> (08_pipeline.py --profile) each stage also runs under cProfile
+# and tracemalloc and writes <dir>/<stage>.prof plus a readable <dir>/<stage>.txt summary.
+# cProfile only sees the main thread, so 07's Ollama calls show up as time waiting on futures.
+
+_lock = threading.Lock()
+_stage = None
+_run_id = None
+_db_name = "emails.db"
+_started = None
+_values = {}  # name -> [kind, count, total, max]
+_profiler = None
+
+# Counters also reported per second spent in a span (e.g. decode speed while requests run), not only per wall second
+PER_SPAN_RATES = {"llm_decode_tokens": "llm_request", "emails_scraped": "download", "rows_inserted": "db_flush"}
+
+def init(stage, db_name="emails.db"):
+    """Starts recording for this process under the given stage name; db_name receives the metrics."""
+    global _stage, _run_id, _db_name, _started, _profiler
+    _stage = stage
+    _db_name = db_name
+    _run_id = os.environ.get("EVENTLIST_RUN_ID") or time.strftime("%Y%m%dT%H%M%S")
+    if _started is None:
+        atexit.register(flush)
+    _started = time.perf_counter()
+    if os.environ.get("EVENTLIST_PROFILE"):
+        import cProfile
+        import tracemalloc
+        tracemalloc.start(25)
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+def _add(kind, name, value):
+    with _lock:
+        entry = _values.setdefault(name, [kind, 0, 0.0, 0.0])
+        entry[1] += 1 if kind == "span" else 0
+        entry[2] += value
+        entry[3] = max(entry[3], value)
+
+def count(name, value=1):
+    _add("counter", name, value)
+
+def observe(name, seconds):
+    """Records a duration measured elsewhere as one occurrence of span name."""
+    _add("span", name, seconds)
+
+@contextlib.contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+def write_profile(directory):
+    import pstats
+    import tracemalloc
+    _profiler.disable()
+    os.makedirs(directory, exist_ok=True)
+    _profiler.dump_stats(os.path.join(directory, f"{_stage}.prof"))
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    with open(os.path.join(directory, f"{_stage}.txt"), "w") as f:
+        f.write(f"== {_stage}: top functions by cumulative time ==\n")
+        pstats.Stats(_profiler, stream=f).sort_stats("cumulative").print_stats(30)
+        f.write(f"== {_stage}: memory (tracemalloc) current {current / 2**20:.1f} MB, peak {peak / 2**20:.1f} MB; top allocations ==\n")
+        for stat in snapshot.statistics("lineno")[:20]:
+            f.write(f"{stat}\n")
+
+def flush():
+    """Writes everything recorded so far (plus the wall time since the last flush) and resets the counters."""
+    global _profiler, _started
+    if _stage is None:
+        return
+    if _profiler is not None:
+        write_profile(os.environ["EVENTLIST_PROFILE"])
+        _profiler = None
+    now = time.perf_counter()
+    observe("total", now - _started)
+    _started = now
+    with _lock:
+        rows = [(_run_id, _stage, name, kind, n, total, peak, time.time()) for name, (kind, n, total, peak) in _values.items()]
+        _values.clear()
+
+    try:
+        conn = sqlite3.connect(_db_name, timeout=30)
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS metrics (
+                    run_id TEXT,
+                    stage TEXT,
+                    name TEXT,
+                    kind TEXT,
+                    count INTEGER,
+                    total REAL,
+                    max REAL,
+                    recorded_at REAL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_metrics_run ON metrics(run_id)")
+            conn.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Warning: could not save metrics: {e}", file=sys.stderr)
+
+    path = os.environ.get("EVENTLIST_METRICS_JSONL")
+    if path:
+        keys = ["run_id", "stage", "name", "kind", "count", "total", "max", "recorded_at"]
+        with open(path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(dict(zip(keys, row))) + "\n")
+
+def report(run_id, db_name="emails.db"):
+    """Per-stage summary of one run: wall time, spans (count / mean / max) and counters with their rate."""
+    conn = sqlite3.connect(db_name)
+    try:
+        rows = conn.execute('''
+            SELECT stage, name, kind, SUM(count), SUM(total), MAX(max) FROM metrics
+            WHERE run_id = ? GROUP BY stage, name, kind ORDER BY MIN(recorded_at), kind DESC, name
+        ''', (run_id,)).fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    conn.close()
+
+    stages = {}
+    for stage, name, kind, n, total, peak in rows:
+        stages.setdefault(stage, []).append((name, kind, n, total, peak))
+
+    lines = [f"Pipeline metrics for run {run_id}:"]
+    for stage, entries in stages.items():
+        wall = next((total for name, _, _, total, _ in entries if name == "total"), 0)
+        span_time = {name: total for name, kind, _, total, _ in entries if kind == "span"}
+        lines.append(f"  {stage} ({wall:.1f}s)")
+        for name, kind, n, total, peak in entries:
+            if name == "total":
+                continue
+            if kind == "span":
+                lines.append(f"    {name:24} {n:7} x  mean {1000 * total / max(n, 1):9.1f} ms  max {1000 * peak:9.1f} ms  "
+                             f"({total:.1f}s in total)")
+            else:
+                rates = [f"{total / wall:.1f}/s"] if wall else []
+                if span_time.get(PER_SPAN_RATES.get(name)):
+                    rates.append(f"{total / span_time[PER_SPAN_RATES[name]]:.1f} per second of {PER_SPAN_RATES[name]}")
+                lines.append(f"    {name:24} {int(total):9d}" + (f"  ({', '.join(rates)})" if rates else ""))
+    if not stages:
+        lines.append("  (nothing recorded)")
+    return "\n".join(lines)
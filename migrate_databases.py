@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import argparse
+import email_store
+
+# One-off import of the old four-file layout (emails.db, emails_labeled.db,
+# emails_events.db, events_info.db) into the single emails.db schema in email_store.py.
+# Rows are matched across files by email_store.dedup_key, since emails_events.db and
+# events_info.db use their own ids. Existing rows in the target are never overwritten; emails
+# the target itself holds twice (stored before dedup_key existed) are merged into the first copy.
+# Example: python migrate_databases.py --prefix EX_ --db example.db
+
+def read_rows(path, query):
+    if not os.path.exists(path):
+        print(f"'{path}' not found, skipping.")
+        return []
+    conn = sqlite3.connect(path)
+    rows = conn.execute(query).fetchall()
+    conn.close()
+    return rows
+
+def import_emails(conn, rows):
+    """Inserts (subject, sender, date, body) rows and returns their dedup keys in order."""
+    writer = email_store.EmailWriter(conn)
+    keys = []
+    for subject, sender, date, body in rows:
+        item = {"subject": subject, "from": sender, "date": date, "body": body}
+        writer.add(item)
+        keys.append(email_store.dedup_key(sender, date, body))
+    writer.close()
+    return keys
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Import the old per-stage database copies into one database.")
+    arg_parser.add_argument("--prefix", default="", help="file name prefix of the old databases (e.g. EX_)")
+    arg_parser.add_argument("--db", default=email_store.DB_NAME, help="target database")
+    args = arg_parser.parse_args()
+
+    conn = email_store.connect(args.db)
+
+    # Databases from before dedup_key existed can hold the same email twice
+    removed = email_store.merge_duplicate_emails(conn)
+    if removed:
+        email_store.add_dedup_keys(conn)
+        print(f"Merged {removed} duplicate emails into their first copy.")
+
+    # emails.db (skipped when it is the target itself)
+    source = f"{args.prefix}emails.db"
+    if os.path.abspath(source) != os.path.abspath(args.db):
+        import_emails(conn, read_rows(source, "SELECT subject, sender, date, body FROM emails ORDER BY id"))
+
+    # emails_labeled.db -> labels
+    labeled = read_rows(f"{args.prefix}emails_labeled.db",
+                        "SELECT subject, sender, date, body, is_event FROM emails WHERE is_event IS NOT NULL ORDER BY id")
+    keys = import_emails(conn, [row[:4] for row in labeled])
+    ids = dict(conn.execute("SELECT dedup_key, id FROM emails"))
+    with conn:
+        cursor = conn.executemany("INSERT OR IGNORE INTO labels (email_id, is_event) VALUES (?, ?)",
+                                  [(ids[key], row[4]) for key, row in zip(keys, labeled)])
+    print(f"Imported {max(cursor.rowcount, 0)} labels.")
+
+    # emails_events.db -> predictions (every row there was classified as an event)
+    events = read_rows(f"{args.prefix}emails_events.db", "SELECT id, subject, sender, date, body FROM emails ORDER BY id")
+    keys = import_emails(conn, [row[1:] for row in events])
+    ids = dict(conn.execute("SELECT dedup_key, id FROM emails"))
+    event_email_ids = {row[0]: ids[key] for key, row in zip(keys, events)}
+    with conn:
+        cursor = conn.executemany("INSERT OR IGNORE INTO predictions (email_id, is_event) VALUES (?, 1)",
+                                  [(email_id,) for email_id in event_email_ids.values()])
+    print(f"Imported {max(cursor.rowcount, 0)} predictions.")
+
+    # events_info.db -> event_info (its ids are emails_events.db ids)
+    infos = read_rows(f"{args.prefix}events_info.db", '''
+        SELECT id, event_name, description, location, date, registration_required, food_provided FROM event_info
+    ''')
+    with conn:
+        cursor = conn.executemany('''
+            INSERT OR IGNORE INTO event_info
+            (email_id, event_name, description, location, date, registration_required, food_provided)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(event_email_ids[row[0]],) + row[1:] for row in infos if row[0] in event_email_ids])
+    print(f"Imported {max(cursor.rowcount, 0)} event_info rows.")
+
+    conn.close()
+    print(f"Migration into '{args.db}' complete; the old database files are no longer used.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import re
+import hashlib
+import argparse
+import numpy as np
+from datetime import datetime
+from dateutil import parser
+from email_store import LOCAL_TZ
+from rule_extraction import SUBJECT_NOISE, find_date
+
+# MinHash index over subject + body of emails classified as events, so reminders, reposts
+# and list cross-posts of the same announcement land in one cluster. 07_extract_event_info.py
+# extracts one email per cluster and links the others to its event_info row (event_links).
+#
+# Each email gets a NUM_PERM MinHash signature of its word shingles; signatures are split
+# into BANDS bands (locality-sensitive hashing) so candidate duplicates are found with an
+# indexed lookup instead of comparing against every stored email. Candidates join a cluster
+# if their estimated Jaccard similarity is at least SIMILARITY_THRESHOLD and they announce the
+# same day: the rule-extracted event date, resolved against the received date ("Tuesday" is
+# the next Tuesday), must match, within WINDOW_DAYS. Emails with no readable date only join
+# within UNDATED_WINDOW_DAYS, so a weekly series with the same text is not one event.
+#
+# Running this file indexes a database and prints the clusters it found:
+#     python near_duplicates.py --db example.db
+
+SHINGLE_WORDS = 3
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: pairs above ~0.5 similarity almost always share a band
+SIMILARITY_THRESHOLD = 0.6
+WINDOW_DAYS = 45
+UNDATED_WINDOW_DAYS = 3
+MIN_SHINGLES = 5  # Shorter texts stay in their own cluster
+
+MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20250512)
+PERM_A = _rng.randint(1, MERSENNE_PRIME, NUM_PERM).astype(np.int64)
+PERM_B = _rng.randint(0, MERSENNE_PRIME, NUM_PERM).astype(np.int64)
+
+WORD = re.compile(r"[a-z0-9]+")
+
+def shingles(subject, body):
+    words = WORD.findall(f"{SUBJECT_NOISE.sub('', subject or '')} {body or ''}".lower())
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 0))}
+
+def signature(shingle_set):
+    """MinHash signature (NUM_PERM int64 values) of a set of shingles."""
+    hashes = np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                       for s in shingle_set], dtype=np.int64) % MERSENNE_PRIME
+    return ((PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+def band_keys(sig):
+    rows = NUM_PERM // BANDS
+    return [(band, int.from_bytes(hashlib.blake2b(sig[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(),
+                                  "little", signed=True))
+            for band in range(BANDS)]
+
+def similarity(sig_a, sig_b):
+    return float(np.mean(sig_a == sig_b))
+
+def event_day(subject, body, received_at):
+    """ISO date the email's first date phrase refers to, counted from the day it was received, or None."""
+    phrase, _ = find_date(f"{subject or ''} {body or ''}")
+    if not phrase or received_at is None:
+        return None
+    received = datetime.fromtimestamp(received_at, LOCAL_TZ).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    try:
+        return parser.parse(phrase.split(" at ")[0], fuzzy=True, default=received).date().isoformat()
+    except (ValueError, OverflowError):
+        return None
+
+class NearDuplicateIndex:
+    """Signatures, LSH buckets and cluster ids of indexed emails, kept in the database."""
+    def __init__(self, conn, threshold=SIMILARITY_THRESHOLD, window_days=WINDOW_DAYS):
+        self.conn = conn
+        self.threshold = threshold
+        self.window = window_days * 86400
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS email_clusters (
+                email_id INTEGER PRIMARY KEY REFERENCES emails(id),
+                cluster_id INTEGER NOT NULL,
+                signature BLOB,
+                event_day TEXT
+            )
+        ''')
+        if "event_day" not in [row[1] for row in conn.execute("PRAGMA table_info(email_clusters)")]:
+            # Clusters built before the date check may merge a recurring series; index them again
+            conn.execute("DROP TABLE IF EXISTS minhash_bands")
+            conn.execute("DELETE FROM email_clusters")
+            conn.execute("ALTER TABLE email_clusters ADD COLUMN event_day TEXT")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS minhash_bands (
+                band INTEGER,
+                bucket INTEGER,
+                email_id INTEGER
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_minhash_bands ON minhash_bands(band, bucket)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_email_clusters_cluster ON email_clusters(cluster_id)")
+        conn.commit()
+
+    def add(self, email_id, subject, body, received_at):
+        """Indexes one email and returns its cluster id (the id of the cluster's first email)."""
+        shingle_set = shingles(subject, body)
+        if len(shingle_set) < MIN_SHINGLES:
+            self.conn.execute("INSERT OR REPLACE INTO email_clusters (email_id, cluster_id) VALUES (?, ?)", (email_id, email_id))
+            return email_id
+
+        sig = signature(shingle_set)
+        day = event_day(subject, body, received_at)
+        keys = band_keys(sig)
+        candidates = set()
+        for band, bucket in keys:
+            candidates.update(row[0] for row in self.conn.execute(
+                "SELECT email_id FROM minhash_bands WHERE band = ? AND bucket = ?", (band, bucket)))
+
+        cluster_id = email_id
+        for candidate_id in sorted(candidates):
+            row = self.conn.execute('''
+                SELECT c.cluster_id, c.signature, e.received_at, c.event_day
+                FROM email_clusters c JOIN emails e ON e.id = c.email_id WHERE c.email_id = ?
+            ''', (candidate_id,)).fetchone()
+            if row is None or row[1] is None:
+                continue
+            if day and row[3]:
+                if day != row[3]:
+                    continue  # Same text, another date: the next event of a series
+                window = self.window
+            else:
+                window = UNDATED_WINDOW_DAYS * 86400
+            if received_at is not None and row[2] is not None and abs(received_at - row[2]) > window:
+                continue
+            if similarity(sig, np.frombuffer(row[1], dtype=np.int64)) >= self.threshold:
+                cluster_id = min(cluster_id, row[0])
+
+        self.conn.execute("INSERT OR REPLACE INTO email_clusters (email_id, cluster_id, signature, event_day) VALUES (?, ?, ?, ?)",
+                          (email_id, cluster_id, sig.tobytes(), day))
+        self.conn.executemany("INSERT INTO minhash_bands (band, bucket, email_id) VALUES (?, ?, ?)",
+                              [(band, bucket, email_id) for band, bucket in keys])
+        return cluster_id
+
+    def update(self):
+        """Indexes every email classified as an event that isn't indexed yet, oldest first. Returns how many."""
+        rows = self.conn.execute('''
+            SELECT e.id, e.subject, e.body, e.received_at
+            FROM predictions p
+            JOIN emails e ON e.id = p.email_id
+            LEFT JOIN email_clusters c ON c.email_id = e.id
+            WHERE p.is_event = 1 AND c.email_id IS NULL
+            ORDER BY e.id
+        ''').fetchall()
+        with self.conn:
+            for row in rows:
+                self.add(*row)
+        return len(rows)
+
+def main():
+    import email_store
+
+    arg_parser = argparse.ArgumentParser(description="Index emails classified as events and report near-duplicate clusters.")
+    arg_parser.add_argument("--db", default=email_store.DB_NAME)
+    args = arg_parser.parse_args()
+
+    conn = email_store.connect(args.db)
+    index = NearDuplicateIndex(conn)
+    print(f"Indexed {index.update()} new emails.")
+
+    clusters = conn.execute('''
+        SELECT c.cluster_id, COUNT(*), MIN(e.subject)
+        FROM email_clusters c JOIN emails e ON e.id = c.email_id
+        GROUP BY c.cluster_id HAVING COUNT(*) > 1 ORDER BY COUNT(*) DESC
+    ''').fetchall()
+    total = conn.execute("SELECT COUNT(*) FROM email_clusters").fetchone()[0]
+    conn.close()
+
+    duplicates = sum(size - 1 for _, size, _ in clusters)
+    print(f"{total} indexed emails, {len(clusters)} clusters with near-duplicates, "
+          f"{duplicates} emails that need no extraction of their own")
+    for cluster_id, size, subject in clusters[:20]:
+        print(f"  {size} x {subject}")
+
+if __name__ == "__main__":
+    main()
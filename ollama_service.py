@@ -0,0 +1,71 @@
+import os
+import json
+import time
+import shutil
+import subprocess
+import urllib.request
+
+# Starting and warming the local Ollama server, for 08_pipeline.py. Only the standard library,
+# so it works before 01_install_dependencies.sh has run. The server address comes from
+# OLLAMA_HOST like the Ollama client's, e.g. OLLAMA_HOST=127.0.0.1:11435 for fake_ollama_server.py.
+#     python ollama_service.py          # start (if needed), wait until ready, load the model
+
+MODEL = "llama3.2:1b"  # The model 07_extract_event_info.py asks
+DEFAULT_HOST = "127.0.0.1:11434"
+READY_TEXT = "Ollama is running"
+START_TIMEOUT = 60
+KEEP_ALIVE = "30m"  # How long Ollama keeps the warmed model in memory
+LOG_PATH = "ollama.log"
+
+def base_url():
+    host = os.environ.get("OLLAMA_HOST") or DEFAULT_HOST
+    if "://" not in host:
+        host = "http://" + host
+    return host.rstrip("/")
+
+def is_ready(timeout=1):
+    """True if the server answers its root URL the way Ollama does."""
+    try:
+        with urllib.request.urlopen(base_url() + "/", timeout=timeout) as response:
+            return READY_TEXT in response.read().decode("utf-8", errors="replace")
+    except OSError:
+        return False
+
+def ensure_running(timeout=START_TIMEOUT):
+    """Starts `ollama serve` unless a server is already up, then polls until it answers. Returns an error message or None."""
+    if is_ready():
+        return None
+    if not shutil.which("ollama"):
+        return f"no Ollama server at {base_url()} and no 'ollama' command to start one"
+    with open(LOG_PATH, "ab") as log:
+        # Its own session, so the server outlives this process like the old `ollama serve &`
+        subprocess.Popen(["ollama", "serve"], stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if is_ready():
+            return None
+        time.sleep(0.25)
+    return f"Ollama did not answer at {base_url()} within {timeout}s (see {LOG_PATH})"
+
+def warm(model=MODEL, keep_alive=KEEP_ALIVE, timeout=300):
+    """Loads model into memory: a generate request with an empty prompt only loads it. Returns an error message or None."""
+    request = urllib.request.Request(base_url() + "/api/generate", method="POST",
+                                     data=json.dumps({"model": model, "prompt": "", "stream": False,
+                                                      "keep_alive": keep_alive}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+    except OSError as e:
+        return f"could not load {model}: {e}"
+    return None
+
+def main():
+    started = time.monotonic()
+    error = ensure_running() or warm()
+    if error:
+        raise SystemExit(f"Ollama not ready: {error}")
+    print(f"Ollama ready at {base_url()} with {MODEL} loaded ({time.monotonic() - started:.1f}s).")
+
+if __name__ == "__main__":
+    main()
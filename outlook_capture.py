@@ -0,0 +1,128 @@
+import json
+from datetime import timezone
+from dateutil import parser
+from email_parsing import build_parsed_email, clean_html
+import metrics
+
+# Helpers for the --capture mode of 02_extract_parse_emails.py: instead of downloading
+# every conversation as .eml, messages are read out of the JSON responses Outlook on the
+# web already fetches for itself (service.svc actions such as GetConversationItems / GetItem,
+# or the REST/Graph shaped payloads newer builds use).
+
+# URL fragments of Outlook responses that can carry message items
+CAPTURE_URL_MARKERS = ("service.svc", "/api/", "/owa/", "graphql")
+
+def _first(obj, *keys):
+    for key in keys:
+        if isinstance(obj, dict) and obj.get(key) not in (None, ""):
+            return obj[key]
+    return None
+
+def _item_id(value):
+    # EWS style {"Id": "..."} or a plain string
+    if isinstance(value, dict):
+        return value.get("Id")
+    return value
+
+def extract_items(payload):
+    """Walks an Outlook JSON payload and yields every dict that looks like a message with a body."""
+    stack = [payload]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, list):
+            stack.extend(reversed(obj))
+        elif isinstance(obj, dict):
+            has_date = _first(obj, "DateTimeReceived", "DateTimeSent", "receivedDateTime", "sentDateTime") is not None
+            has_body = _first(obj, "UniqueBody", "NewBodyContent", "Body", "body") is not None
+            if has_date and has_body and _first(obj, "Subject", "subject") is not None:
+                yield obj
+            else:
+                stack.extend(reversed(list(obj.values())))
+
+def item_sender(item):
+    sender = _first(item, "From", "Sender", "from", "sender") or {}
+    mailbox = _first(sender, "Mailbox", "emailAddress") or {}
+    name = _first(mailbox, "Name", "name") or ""
+    address = _first(mailbox, "EmailAddress", "address") or ""
+    if name and address:
+        return f"{name} <{address}>"
+    return name or address
+
+def item_body(item):
+    # UniqueBody holds just this message, without the quoted thread below it
+    body = _first(item, "UniqueBody", "NewBodyContent", "Body", "body")
+    if isinstance(body, str):
+        return body
+    text = _first(body, "Value", "content") or ""
+    body_type = str(_first(body, "BodyType", "contentType") or "").lower()
+    if body_type == "html" or "<html" in text[:200].lower():
+        text = clean_html(text)
+    return text
+
+def item_datetime(item):
+    raw = _first(item, "DateTimeReceived", "receivedDateTime", "DateTimeSent", "sentDateTime")
+    try:
+        dt = parser.isoparse(raw)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+def item_conversation_id(item):
+    return _item_id(_first(item, "ConversationId", "conversationId")) or _item_id(_first(item, "ItemId", "id"))
+
+def conversations_from_payload(payload):
+    """Groups the message items of a payload by conversation id, oldest first."""
+    conversations = {}
+    for item in extract_items(payload):
+        dt = item_datetime(item)
+        if dt is None:
+            continue
+        conversations.setdefault(item_conversation_id(item), []).append((dt, item))
+    for items in conversations.values():
+        items.sort(key=lambda pair: pair[0])
+    return conversations
+
+def make_response_handler(state, threshold, record_path=None):
+    """
+    Returns a page.on("response") handler that parses captured conversations into state["writer"].
+    threshold is an aware datetime; like the .eml path, a conversation is kept by its original
+    (oldest) message, and a conversation whose newest message is not after threshold stops the run.
+    """
+    async def handle_response(response):
+        if not any(marker in response.url for marker in CAPTURE_URL_MARKERS):
+            return
+        if "json" not in (response.headers.get("content-type") or ""):
+            return
+        try:
+            payload = await response.json()
+        except Exception:
+            return
+
+        if record_path:
+            with open(record_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"url": response.url, "body": payload}, ensure_ascii=False) + "\n")
+
+        for cid, items in conversations_from_payload(payload).items():
+            if cid in state["captured_ids"]:
+                continue
+            state["captured_ids"].add(cid)
+
+            if items[-1][0] <= threshold:
+                state["reached_threshold"] = True
+                continue
+            original_dt, original = items[0]
+            if original_dt <= threshold:
+                # Only new replies to an old thread
+                state["writer"].mark_processed(cid)
+                continue
+
+            subject = _first(original, "Subject", "subject") or ""
+            email = build_parsed_email(subject, item_sender(original), original_dt, item_body(original))
+            state["writer"].add(email, cid)
+            metrics.count("emails_scraped")
+            state["downloaded_count"] += 1
+            print(f"Captured {state['downloaded_count']} emails. Most recent capture date: {email['date']}")
+
+    return handle_response
@@ -0,0 +1,139 @@
+import json, argparse
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from email_store import LOCAL_TZ, DATE_FORMAT
+from outlook_capture import conversations_from_payload, item_datetime
+
+# Offline stand-in for Outlook on the web, used to exercise
+# `02_extract_parse_emails.py --capture --base-url http://localhost:8765` with no network.
+# Serves an inbox list of [data-convid] rows that loads more rows as it scrolls and,
+# when a row is clicked, answers with an OWA-style GetConversationItems JSON response.
+# Conversations come either from a recording made with --record, or are synthesized
+# from a parsed_emails.json file (e.g. EX_parsed_emails.json).
+
+PAGE_SIZE = 25
+
+INBOX_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Mail</title>
+<style>[data-convid] { height: 48px; border-bottom: 1px solid #ddd; cursor: pointer; }</style>
+</head><body><div id="list"></div>
+<script>
+let offset = 0, loading = false, done = false;
+async function loadMore() {
+    if (loading || done) return;
+    loading = true;
+    const res = await fetch(`/owa/service.svc?action=FindConversation&offset=${offset}`);
+    const data = await res.json();
+    const conversations = data.Body.Conversations;
+    for (const c of conversations) {
+        const row = document.createElement("div");
+        row.setAttribute("data-convid", c.ConversationId.Id);
+        row.textContent = c.ConversationTopic;
+        row.onclick = () => fetch(`/owa/service.svc?action=GetConversationItems&id=${encodeURIComponent(c.ConversationId.Id)}`);
+        document.getElementById("list").appendChild(row);
+    }
+    offset += conversations.length;
+    done = conversations.length === 0;
+    loading = false;
+}
+window.addEventListener("scroll", () => {
+    if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 200) loadMore();
+});
+loadMore();
+</script></body></html>"""
+
+def conversations_from_recording(path):
+    conversations = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                for cid, items in conversations_from_payload(json.loads(line)["body"]).items():
+                    conversations.setdefault(cid, {})
+                    for dt, item in items:
+                        conversations[cid][dt] = item
+    return {cid: [items[dt] for dt in sorted(items)] for cid, items in conversations.items()}
+
+def conversations_from_parsed_json(path):
+    with open(path, encoding="utf-8") as f:
+        emails = json.load(f)
+
+    conversations = {}
+    for n, email in enumerate(emails):
+        dt = LOCAL_TZ.localize(datetime.strptime(email["date"], DATE_FORMAT))
+        name, _, address = email["from"].rpartition(" <")
+        conversations[f"conv-{n}"] = [{
+            "ItemId": {"Id": f"item-{n}"},
+            "ConversationId": {"Id": f"conv-{n}"},
+            "Subject": email["subject"],
+            "From": {"Mailbox": {"Name": name, "EmailAddress": address.rstrip(">")}},
+            "DateTimeReceived": dt.isoformat(),
+            "UniqueBody": {"BodyType": "Text", "Value": email["body"]},
+        }]
+    return conversations
+
+def make_handler(conversations):
+    # Inbox order: newest conversation first
+    order = sorted(conversations, key=lambda cid: item_datetime(conversations[cid][-1]), reverse=True)
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def send_json(self, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            action = query.get("action", [""])[0]
+
+            if url.path.startswith("/mail"):
+                data = INBOX_HTML.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            elif action == "FindConversation":
+                offset = int(query.get("offset", ["0"])[0])
+                page = order[offset:offset + PAGE_SIZE]
+                self.send_json({"Body": {"Conversations": [{
+                    "ConversationId": {"Id": cid},
+                    "ConversationTopic": conversations[cid][0]["Subject"],
+                    "LastDeliveryTime": conversations[cid][-1]["DateTimeReceived"],
+                } for cid in page]}})
+            elif action == "GetConversationItems":
+                cid = query.get("id", [""])[0]
+                self.send_json({"Body": {"ResponseMessages": {"Items": [{
+                    "Conversation": {"ConversationNodes": [{"Items": conversations.get(cid, [])}]}
+                }]}}})
+            else:
+                self.send_error(404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReplayHandler
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Serve recorded or synthesized Outlook responses for offline capture runs.")
+    source = arg_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--recording", help="JSONL file written by 02_extract_parse_emails.py --capture --record")
+    source.add_argument("--from-json", help="parsed_emails.json style file to synthesize conversations from")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    args = arg_parser.parse_args()
+
+    if args.recording:
+        conversations = conversations_from_recording(args.recording)
+    else:
+        conversations = conversations_from_parsed_json(args.from_json)
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(conversations))
+    print(f"Serving {len(conversations)} conversations at http://127.0.0.1:{args.port}/mail/")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
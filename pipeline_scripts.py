@@ -0,0 +1,15 @@
+import os
+import importlib.util
+
+# The numbered pipeline scripts can't be imported by name (a module name can't start with a
+# digit), so tools that reuse their functions in one process (09_daemon.py, benchmark.py)
+# load them from their file with load_script.
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_script(name):
+    """Imports a numbered pipeline script (e.g. 06_classify_emails.py) as a module without running it."""
+    spec = importlib.util.spec_from_file_location(name.replace(".py", "").lstrip("0123456789_"), os.path.join(SCRIPTS_DIR, name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,134 @@
+import re
+import argparse
+
+# Shrinks an email body to the spans that matter for event extraction before it is pasted
+# into the 07_extract_event_info.py prompt: sentences mentioning dates/times, rooms and
+# buildings, food, or registration. A 1B model on CPU pays for every prompt token, and
+# newsletters flattened by clean_html are mostly unrelated text.
+#
+# Running this file measures it on a database with event_info rows, e.g. after
+# `python migrate_databases.py --prefix EX_ --db example.db`:
+#     python prompt_compaction.py --db example.db
+
+TOKEN_BUDGET = 300
+WINDOW_WORDS = 40  # Long run-on "sentences" are cut into windows of this many words
+
+WEEKDAYS = r"(?:mon|tues?|wed(?:nes)?|thu(?:rs)?|fri|sat(?:ur)?|sun)(?:day)?"
+MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+
+DATE_PATTERN = re.compile(rf"\b{WEEKDAYS}\b|\b{MONTHS}\.? \d{{1,2}}\b|\b\d{{1,2}}/\d{{1,2}}\b|\b(?:today|tomorrow|tonight)\b", re.I)
+TIME_PATTERN = re.compile(r"\b\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)|\bnoon\b|\b\d{1,2}:\d{2}\b", re.I)
+# MIT rooms: 32-123, E14-633, W20-491
+ROOM_PATTERN = re.compile(r"\b[NEWS]{0,2}\d{1,2}[A-Z]?-\d{3,4}[A-Z]?\b")
+VENUE_PATTERN = re.compile(r"\b(?:room|building|hall|auditorium|lobby|lounge|center|stata|kresge|walker|student center|zoom|online|virtual|location|venue)\b", re.I)
+FOOD_PATTERN = re.compile(r"\b(?:food|pizza|lunch|dinner|breakfast|brunch|snacks?|refreshments|coffee|drinks|catered|boba|cookies|desserts?|meal|treats)\b", re.I)
+RSVP_PATTERN = re.compile(r"\b(?:rsvp|register|registration|sign[- ]?up|tickets?|eventbrite|required|free)\b", re.I)
+
+SIGNALS = [
+    # (weight, pattern)
+    (3, DATE_PATTERN),
+    (3, TIME_PATTERN),
+    (3, ROOM_PATTERN),
+    (2, VENUE_PATTERN),
+    (2, FOOD_PATTERN),
+    (2, RSVP_PATTERN),
+]
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for English with llama tokenizers
+    return len(text) // 4 + 1
+
+def split_spans(body):
+    spans = []
+    for sentence in SENTENCE_END.split(body):
+        words = sentence.split()
+        for i in range(0, len(words), WINDOW_WORDS):
+            spans.append(" ".join(words[i:i + WINDOW_WORDS]))
+    return [span for span in spans if span]
+
+def score_span(span):
+    return sum(weight * len(pattern.findall(span)) for weight, pattern in SIGNALS)
+
+def compact_body(body, budget=TOKEN_BUDGET):
+    """
+    Returns (excerpt, tokens_saved). The excerpt keeps the opening span (usually the event title)
+    and the highest scoring spans, in their original order, within budget tokens.
+    Bodies already under budget are returned unchanged.
+    """
+    body = body or ""
+    original_tokens = estimate_tokens(body)
+    if original_tokens <= budget:
+        return body, 0
+
+    spans = split_spans(body)
+    ranked = sorted(range(len(spans)), key=lambda i: (i != 0, -score_span(spans[i]), i))
+
+    chosen, used = set(), 0
+    for i in ranked:
+        if i != 0 and score_span(spans[i]) == 0:
+            break
+        cost = estimate_tokens(spans[i])
+        if used + cost > budget:
+            continue
+        chosen.add(i)
+        used += cost
+
+    # Spend what is left of the budget on the text right after the opening
+    for i in range(1, len(spans)):
+        cost = estimate_tokens(spans[i])
+        if i not in chosen and used + cost <= budget:
+            chosen.add(i)
+            used += cost
+        elif used + cost > budget:
+            break
+
+    parts = []
+    for i in sorted(chosen):
+        if parts and i - 1 not in chosen:
+            parts.append("...")
+        parts.append(spans[i])
+    excerpt = " ".join(parts)
+    return excerpt, original_tokens - estimate_tokens(excerpt)
+
+def field_words(value):
+    # Content words of a reference answer, for checking they survive compaction
+    if not value or value.lower() in ("unknown", "none", "no", "yes"):
+        return []
+    return [word for word in re.findall(r"[\w-]+", value.lower()) if len(word) > 2]
+
+def main():
+    import email_store
+
+    arg_parser = argparse.ArgumentParser(description="Measure prompt compaction on emails with extracted event_info.")
+    arg_parser.add_argument("--db", default=email_store.DB_NAME)
+    arg_parser.add_argument("--budget", type=int, default=TOKEN_BUDGET)
+    args = arg_parser.parse_args()
+
+    conn = email_store.connect(args.db)
+    rows = conn.execute('''
+        SELECT e.body, i.location, i.date, i.food_provided
+        FROM event_info i JOIN emails e ON e.id = i.email_id
+    ''').fetchall()
+    conn.close()
+
+    before = after = kept = total = 0
+    for body, *fields in rows:
+        excerpt, saved = compact_body(body, args.budget)
+        before += estimate_tokens(body or "")
+        after += estimate_tokens(excerpt)
+        excerpt_lower = excerpt.lower()
+        body_lower = (body or "").lower()
+        for value in fields:
+            # Only count answer words that were in the body to begin with
+            words = [word for word in field_words(value) if word in body_lower]
+            total += len(words)
+            kept += sum(word in excerpt_lower for word in words)
+
+    print(f"{len(rows)} emails: {before} -> {after} prompt body tokens ({100 * (before - after) / max(before, 1):.0f}% saved, "
+          f"{(before - after) / max(len(rows), 1):.0f} per email)")
+    print(f"Reference location/date/food words kept in the excerpt: {kept}/{total} ({100 * kept / max(total, 1):.1f}%)")
+
+if __name__ == "__main__":
+    main()
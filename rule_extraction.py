@@ -0,0 +1,175 @@
+import re
+import argparse
+from dateutil import parser
+from prompt_compaction import WEEKDAYS, MONTHS, ROOM_PATTERN, FOOD_PATTERN, split_spans
+
+# Deterministic first pass for 07_extract_event_info.py. Each event_info field that can be
+# read off the text with rules gets a value and a confidence; only fields below
+# CONFIDENCE_THRESHOLD are left for the LLM, through a prompt that asks for just those.
+#
+# Running this file reports how many fields / emails the rules resolve on a database
+# with event_info rows and how often they agree with the stored answers:
+#     python rule_extraction.py --db example.db
+
+FIELDS = ["event_name", "description", "location", "date", "registration_required", "food_provided"]
+CONFIDENCE_THRESHOLD = 0.7
+
+TIME = r"(?:\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)|noon)"
+DATE_PHRASE = re.compile(
+    rf"\b(?:{WEEKDAYS},?\s+)?{MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?(?:,?\s+\d{{4}})?\b"
+    rf"|\b(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)(?:,?\s+\d{{1,2}}/\d{{1,2}}(?:/\d{{2,4}})?)?\b"
+    rf"|\b\d{{1,2}}/\d{{1,2}}(?:/\d{{2,4}})?\b", re.I)
+TIME_PHRASE = re.compile(rf"\b{TIME}(?:\s*(?:-|–|to)\s*{TIME})?", re.I)
+ONLINE_PLATFORM = re.compile(r"\b(?:zoom|webinar|microsoft teams)\b", re.I)
+ONLINE = re.compile(r"\b(?:online|virtual(?:ly)?)\b", re.I)
+# A venue keyword only counts after a proper name ("Stata Center", not "the Building")
+VENUE = re.compile(r"\b(?!(?:The|This|That|Our|Your|A|An|Each|Every)\s)(?:[A-Z][\w'’]+\s){1,3}"
+                   r"(?:Room|Hall|Auditorium|Center|Lounge|Lobby|Building|Library|Court|Gym|Theater|Theatre)\b")
+REGISTRATION_NO = re.compile(r"\b(?:no (?:registration|rsvp|sign[- ]?up|tickets?) (?:is )?(?:required|needed|necessary)|open to (?:all|everyone|the public)|drop[- ]in|walk[- ]ins? welcome)\b", re.I)
+REGISTRATION_YES = re.compile(r"\b(?:rsvp|register|registration|sign[- ]?up|tickets?|eventbrite|reserve (?:a|your) (?:spot|seat))\b", re.I)
+NO_FOOD = re.compile(r"\bno (?:food|refreshments|meals?)\b", re.I)
+FOOD_CUE = re.compile(r"\b(?:provid(?:ed|ing)|serv(?:ed|ing)|free|catered|enjoy|grab|(?:will|we'll|i'll) (?:be|have)|"
+                      r"join us for|stop by|come (?:by|for))\b", re.I)
+SUBJECT_NOISE = re.compile(r"^(?:\s*(?:\[[^\]]*\]|re:|fwd?:|reminder:|last call:|tomorrow:|today:|tonight:))+\s*", re.I)
+
+def find_date(text):
+    """First date phrase, plus the nearest time phrase within 100 characters of it."""
+    match = DATE_PHRASE.search(text)
+    time_match = None
+    if match:
+        window_start = max(match.start() - 100, 0)
+        time_match = TIME_PHRASE.search(text, window_start, match.end() + 100)
+    else:
+        time_match = TIME_PHRASE.search(text)
+
+    if match and time_match:
+        return f"{match.group(0)} at {time_match.group(0)}", 0.9
+    if match:
+        try:
+            parser.parse(match.group(0), fuzzy=True)
+            return match.group(0), 0.65
+        except (ValueError, OverflowError):
+            return match.group(0), 0.4
+    if time_match:
+        return time_match.group(0), 0.5
+    return None, 0
+
+def find_location(text):
+    room = ROOM_PATTERN.search(text)
+    if room:
+        # Keep a venue name right before the room number, e.g. "Stata Center, 32-123"
+        venue = VENUE.search(text, max(room.start() - 40, 0), room.start())
+        return (f"{venue.group(0).strip()}, {room.group(0)}" if venue else room.group(0)), 0.9
+    venue = VENUE.search(text)
+    if venue:
+        return venue.group(0).strip(), 0.75
+    platform = ONLINE_PLATFORM.search(text)
+    if platform:
+        return f"Online ({platform.group(0)})", 0.8
+    if ONLINE.search(text):
+        # "Register online", "virtual tour": too often not where the event is
+        return "Online", 0.5
+    return None, 0
+
+def find_registration(text):
+    if REGISTRATION_NO.search(text):
+        return "no", 0.85
+    if REGISTRATION_YES.search(text):
+        return "yes", 0.8
+    return None, 0
+
+def find_food(text):
+    if NO_FOOD.search(text):
+        return "none", 0.8
+    foods, seen, cued = [], set(), False
+    for match in FOOD_PATTERN.finditer(text):
+        food = match.group(0).lower()
+        cued = cued or bool(FOOD_CUE.search(text, max(match.start() - 60, 0), match.end() + 60))
+        # "snack" and "snacks" are one food
+        if food != "food" and food.rstrip("s") not in seen:
+            seen.add(food.rstrip("s"))
+            foods.append(food)
+    if foods:
+        # A food word with nothing saying it is served ("lunch talk", "coffee chat") is left to the LLM
+        return ", ".join(foods[:4]), 0.8 if cued else 0.6
+    if FOOD_PATTERN.search(text):
+        return "food", 0.6
+    return None, 0
+
+def find_event_name(subject):
+    name = SUBJECT_NOISE.sub("", subject or "").strip()
+    if 1 <= len(name.split()) <= 12:
+        return name, 0.75
+    return name or None, 0.4
+
+def find_description(body):
+    spans = split_spans(body or "")
+    for span in spans[:3]:
+        words = span.split()
+        # Skip preheader filler and link lists: most words should be real words
+        wordy = sum(bool(re.match(r"^[A-Za-z][\w'’,.!?:;-]*$", word)) for word in words)
+        if 8 <= len(words) <= 50 and wordy >= 0.8 * len(words):
+            return span, 0.7
+    return (spans[0] if spans else None), 0.4
+
+def extract_fields(subject, body):
+    """Returns {field: (value, confidence)} for every field in FIELDS (value None if nothing matched)."""
+    text = f"{subject or ''}. {body or ''}"
+    return {
+        "event_name": find_event_name(subject),
+        "description": find_description(body),
+        "location": find_location(text),
+        "date": find_date(text),
+        "registration_required": find_registration(text),
+        "food_provided": find_food(text),
+    }
+
+def resolve(subject, body, threshold=CONFIDENCE_THRESHOLD):
+    """Splits FIELDS into ({field: value} resolved by rules, [fields left for the LLM])."""
+    resolved, missing = {}, []
+    for field, (value, confidence) in extract_fields(subject, body).items():
+        if value is not None and confidence >= threshold:
+            resolved[field] = value
+        else:
+            missing.append(field)
+    return resolved, missing
+
+def main():
+    import email_store
+
+    arg_parser = argparse.ArgumentParser(description="Measure rule-based extraction on emails with extracted event_info.")
+    arg_parser.add_argument("--db", default=email_store.DB_NAME)
+    args = arg_parser.parse_args()
+
+    conn = email_store.connect(args.db)
+    rows = conn.execute('''
+        SELECT e.subject, e.body, i.location, i.date, i.registration_required, i.food_provided
+        FROM event_info i JOIN emails e ON e.id = i.email_id
+    ''').fetchall()
+    conn.close()
+
+    checked = ["location", "date", "registration_required", "food_provided"]
+    resolved_counts = {field: 0 for field in FIELDS}
+    agree = {field: 0 for field in checked}
+    no_llm = 0
+    for subject, body, *answers in rows:
+        resolved, missing = resolve(subject, body)
+        no_llm += not missing
+        for field in resolved:
+            resolved_counts[field] += 1
+        for field, answer in zip(checked, answers):
+            if field in resolved and answer:
+                # Loose agreement: any shared content word, or the same yes/no/none
+                got, want = resolved[field].lower(), answer.lower()
+                words = set(re.findall(r"[\w-]{3,}", want))
+                agree[field] += got == want or any(word in got for word in words)
+
+    print(f"{len(rows)} emails, {no_llm} need no LLM call")
+    for field in FIELDS:
+        line = f"  {field}: resolved by rules in {resolved_counts[field]}"
+        if field in agree and resolved_counts[field]:
+            line += f", agrees with stored answer in {agree[field]}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import re
+import html
+import json
+import random
+import sqlite3
+import argparse
+from email import policy
+from email.message import EmailMessage
+from email.generator import BytesGenerator
+from email.utils import format_datetime
+from datetime import datetime, timedelta
+from email_store import LOCAL_TZ
+
+# Generates mbox mailboxes of any size for benchmark.py, seeded from the example fixtures:
+# event announcements from EX_emails_events.db, everything else from EX_emails_labeled.db
+# and EX_parsed_emails.json. Each message is a plain + newsletter-style HTML alternative,
+# some are "Re:" chains quoting an earlier message, list mail carries a List-Id header, and
+# sentences are dropped and reordered so copies of a seed are similar but not identical.
+# The same arguments always give the same mailbox.
+#     python synthetic_mailbox.py --count 10000 --output mailbox.mbox
+
+EVENT_RATIO = None  # Default: the share of events among the labeled example emails
+REPLY_RATIO = 0.15
+DROP_SENTENCE = 0.15
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+SUBJECT_TAG = re.compile(r"^\s*\[([^\]]+)\]")
+REPLIES = ["Thanks, see you there!", "Is this open to grad students too?", "Forwarding in case anyone is interested.",
+           "Can we still sign up?", "Reminder: this is happening soon."]
+
+def newsletter_html(subject, body):
+    """Wraps a corpus body in the kind of HTML mailing lists send: tables, styles, scripts, comments, entities."""
+    paragraphs = "".join(f"<tr><td><p style='margin:0'>{html.escape(sentence)}</p></td></tr>\n"
+                         for sentence in SENTENCE_END.split(body) if sentence)
+    return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(subject)}</title>
+<style>td {{ font-family: Arial; }} .x {{ color: red; }}</style>
+<script type="text/javascript">var tracking = "<p>not text</p>";</script></head>
+<body><!-- preheader --><table role="presentation" width="100%">{paragraphs}</table>
+<div class="footer">&copy; MIT&nbsp;&ndash; <a href="https://example.mit.edu">unsubscribe</a></div></body></html>"""
+
+def load_seeds(prefix="EX_"):
+    """(event seeds, other seeds, observed event ratio); a seed is (subject, sender, body)."""
+    def rows(path, query):
+        conn = sqlite3.connect(path)
+        result = conn.execute(query).fetchall()
+        conn.close()
+        return result
+
+    events = rows(f"{prefix}emails_events.db", "SELECT subject, sender, body FROM emails")
+    labeled = rows(f"{prefix}emails_labeled.db", "SELECT subject, sender, body, is_event FROM emails WHERE is_event IS NOT NULL")
+    with open(f"{prefix}parsed_emails.json", encoding="utf-8") as f:
+        parsed = json.load(f)
+
+    event_bodies = {body for _, _, body in events} | {body for _, _, body, is_event in labeled if is_event}
+    others = [row[:3] for row in labeled if not row[3]]
+    others += [(email["subject"], email["from"], email["body"]) for email in parsed if email["body"] not in event_bodies]
+    ratio = sum(row[3] for row in labeled) / max(len(labeled), 1)
+    return events, others, ratio
+
+def vary(body, rng, serial):
+    """Drops and swaps a few sentences and adds a footer line, so copies of a seed differ."""
+    sentences = [s for s in SENTENCE_END.split(body or "") if s and rng.random() > DROP_SENTENCE] or [body or ""]
+    if len(sentences) > 3:
+        i = rng.randrange(1, len(sentences) - 1)
+        sentences[i], sentences[i + 1] = sentences[i + 1], sentences[i]
+    return " ".join(sentences) + f"\n\nMessage {serial} of this mailbox."
+
+def build_message(subject, sender, body, dt, rng, serial, quoted=None):
+    msg = EmailMessage()
+    msg["Subject"] = " ".join(subject.split())
+    msg["From"] = sender
+    msg["To"] = "students@mit.edu"
+    msg["Date"] = format_datetime(dt)
+    msg["Message-ID"] = f"<synthetic.{serial}@mit.edu>"
+    tag = SUBJECT_TAG.match(subject)
+    if tag:
+        msg["List-Id"] = f"{tag.group(1)} <{re.sub(r'[^a-z0-9]+', '-', tag.group(1).lower()).strip('-')}.mit.edu>"
+
+    if quoted:
+        # Reply on top, then the quoted original with Outlook-style headers, as split_replies expects
+        q_subject, q_sender, q_body, q_dt = quoted
+        body = (f"{rng.choice(REPLIES)}\n\nFrom: {q_sender}\nSent: {q_dt.strftime('%A, %B %d, %Y %I:%M %p')}\n"
+                f"To: students@mit.edu\nSubject: {' '.join(q_subject.split())}\n\n{q_body}")
+    msg.set_content(body or " ")
+    msg.add_alternative(newsletter_html(subject, body or ""), subtype="html")
+    msg.set_boundary(f"==synthetic-{serial}==")  # Fixed, so the same arguments give byte-identical mailboxes
+    return msg
+
+def generate(path, count, event_ratio=EVENT_RATIO, reply_ratio=REPLY_RATIO, seed=0, prefix="EX_", days=365):
+    """Writes count messages, oldest first, spread over the days before 2025-06-01. Returns the number of events."""
+    events, others, observed = load_seeds(prefix)
+    ratio = observed if event_ratio is None else event_ratio
+    rng = random.Random(seed)
+    start = LOCAL_TZ.localize(datetime(2025, 6, 1)) - timedelta(days=days)
+    step = timedelta(days=days) / max(count, 1)
+    recent = []
+    generated_events = 0
+
+    with open(path, "wb") as f:
+        generator = BytesGenerator(f, mangle_from_=True, policy=policy.default.clone(linesep="\n"))
+        for serial in range(count):
+            dt = start + step * serial + timedelta(minutes=rng.randrange(0, 30))
+            is_event = rng.random() < ratio
+            generated_events += is_event
+            subject, sender, body = rng.choice(events if is_event else others)
+            body = vary(body, rng, serial)
+
+            quoted = None
+            if recent and rng.random() < reply_ratio:
+                quoted = rng.choice(recent)
+                subject = "Re: " + quoted[0]
+            msg = build_message(subject, sender, body, dt, rng, serial, quoted)
+
+            recent = (recent + [(subject, sender, body, dt)])[-50:]
+            f.write(f"From MAILER-DAEMON {dt.strftime('%a %b %d %H:%M:%S %Y')}\n".encode())
+            generator.flatten(msg)
+            f.write(b"\n")
+    return generated_events
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic mbox seeded from the example emails.")
+    arg_parser.add_argument("--count", type=int, default=1000)
+    arg_parser.add_argument("--output", default="mailbox.mbox")
+    arg_parser.add_argument("--event-ratio", type=float, default=EVENT_RATIO)
+    arg_parser.add_argument("--reply-ratio", type=float, default=REPLY_RATIO)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--prefix", default="EX_", help="file name prefix of the seed fixtures")
+    args = arg_parser.parse_args()
+
+    events = generate(args.output, args.count, args.event_ratio, args.reply_ratio, args.seed, args.prefix)
+    print(f"Wrote {args.count} messages ({events} event announcements) to '{args.output}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import os
+import joblib
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+import compact_model
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TRAIN = [
+    ("Pizza talk: Quantum photonics, Thursday 5pm in 32-123", 1),
+    ("Join us for a study break with boba in the Stata Center lobby", 1),
+    ("RSVP: career panel and networking dinner, May 8 at 6:00pm", 1),
+    ("Free food! Hackathon kickoff in Walker Memorial this Saturday", 1),
+    ("Your package has been delivered to the front desk", 0),
+    ("Re: problem set 4 solutions posted", 0),
+    ("Job: software engineer, Boston area, apply by Friday", 0),
+    ("Reminder: update your emergency contact information", 0),
+]
+
+# Unseen words, repeated terms, case and punctuation, unicode and an empty text
+TEXTS = [text for text, _ in TRAIN] + [
+    "PIZZA pizza Pizza and more pizza in 32-123!!",
+    "Café crème brûlée social — Thursday, 5/8 at noon",
+    "completely unrelated vocabulary xyzzy plugh",
+    "",
+    "dinner dinner dinner rsvp rsvp",
+]
+
+def check_parity(pipeline, directory):
+    compact_model.export(pipeline, "test", str(directory))
+    compact = compact_model.CompactClassifier(str(directory))
+    expected = pipeline.decision_function(TEXTS)
+    np.testing.assert_allclose(compact.decision_function(TEXTS), expected, rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(compact.predict(TEXTS), pipeline.predict(TEXTS))
+
+@pytest.mark.parametrize("options", [{}, {"sublinear_tf": True}, {"binary": True}, {"norm": "l1"}, {"use_idf": False}])
+def test_matches_pickled_pipeline(tmp_path, options):
+    pipeline = make_pipeline(TfidfVectorizer(**options), LogisticRegression(class_weight="balanced", max_iter=1000))
+    pipeline.fit([text for text, _ in TRAIN], [label for _, label in TRAIN])
+    # Round-trip through joblib, as 05_train_model.py saves it and 06 loads it
+    joblib.dump(pipeline, tmp_path / "model.pkl")
+    check_parity(joblib.load(tmp_path / "model.pkl"), tmp_path / "compact")
+
+def test_matches_repo_model(tmp_path):
+    path = os.path.join(REPO_DIR, "event_classifier.pkl")
+    if not os.path.exists(path):
+        pytest.skip("no event_classifier.pkl")
+    check_parity(joblib.load(path), tmp_path / "compact")
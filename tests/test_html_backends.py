@@ -0,0 +1,36 @@
+from email.message import EmailMessage
+import pytest
+import email_parsing
+
+# The kinds of HTML get_body sees: mailing list tables with styles and scripts, entities and
+# comments, unclosed tags, a bare fragment, a document with an XML declaration, an empty part
+SAMPLES = [
+    """<!DOCTYPE html><html><head><meta charset="utf-8"><title>Pizza talk</title>
+<style>td { font-family: Arial; }</style><script>var tracking = "<p>not text</p>";</script></head>
+<body><!-- preheader --><table role="presentation"><tr><td><p>Quantum photonics,</p></td></tr>
+<tr><td><p>Thursday 5pm in 32-123.</p></td></tr></table>
+<div class="footer">&copy; MIT&nbsp;&ndash; <a href="https://example.mit.edu">unsubscribe</a></div></body></html>""",
+    "<p>Study break<br>with <b>boba</b> &amp; cookies<p>Stata Center lobby, 8pm",
+    "<div>Caf&eacute; cr&egrave;me social — Thursday, 5/8 at noon</div><ul><li>RSVP</li><li>Free</li></ul>",
+    '<?xml version="1.0" encoding="utf-8"?><html><body><p>Career panel, May 8</p></body></html>',
+    "",
+]
+
+def html_message(html, with_plain):
+    msg = EmailMessage()
+    msg["Subject"] = "Event"
+    if with_plain:
+        msg.set_content("plain text alternative")
+        msg.add_alternative(html, subtype="html")
+    else:
+        msg.set_content(html, subtype="html")
+    return msg
+
+@pytest.mark.parametrize("backend", sorted(email_parsing.HTML_BACKENDS))
+@pytest.mark.parametrize("with_plain", [True, False])
+@pytest.mark.parametrize("html", SAMPLES)
+def test_backends_agree(monkeypatch, backend, with_plain, html):
+    monkeypatch.setattr(email_parsing, "HTML_BACKEND", "bs4")
+    expected = email_parsing.get_body(html_message(html, with_plain))
+    monkeypatch.setattr(email_parsing, "HTML_BACKEND", backend)
+    assert email_parsing.get_body(html_message(html, with_plain)) == expected
@@ -0,0 +1,124 @@
+import re
+import argparse
+from email.utils import parseaddr
+
+# First levels of the 06_classify_emails.py cascade. Many senders are always or never events
+# (payroll@mit.edu never is, some event lists always are), so per-mailing-list and per-sender
+# event rates are kept in the verdict_stats table, built from manual labels and past model
+# predictions. An email whose list or sender has a confident rate gets that verdict directly;
+# only the rest go to the TF-IDF + logistic regression pipeline.
+#
+# Running this file rebuilds the table and prints the confident keys:
+#     python verdict_cache.py --db example.db
+
+MIN_COUNT = 8        # Emails seen from a key before it can decide anything
+CONFIDENCE = 0.9     # Smoothed event rate needed (or 1 - rate for "not an event")
+LEVELS = ["list", "sender"]
+
+SUBJECT_TAG = re.compile(r"^\s*(?:(?:re|fwd?):\s*)*\[([^\]]+)\]", re.I)
+
+def list_key(list_id, subject):
+    """List-Id address ('eecs-opps.mit.edu'), or the '[List Name]' subject tag lists add when there's no header."""
+    if list_id:
+        match = re.search(r"<([^>]+)>", list_id)
+        return (match.group(1) if match else list_id).strip().lower()
+    match = SUBJECT_TAG.match(subject or "")
+    return f"[{match.group(1).strip().lower()}]" if match else None
+
+def sender_key(sender):
+    """The sender with its display name, lowercased: mailer@campusgroups.com sends for many groups."""
+    name, address = parseaddr(sender or "")
+    if not address:
+        return None
+    return f"{name.strip().lower()} <{address.lower()}>" if name else address.lower()
+
+def keys_for(sender, list_id, subject):
+    return {"list": list_key(list_id, subject), "sender": sender_key(sender)}
+
+class VerdictCache:
+    """Event counts per (level, key) and the confident verdicts they imply."""
+    def __init__(self, conn, min_count=MIN_COUNT, confidence=CONFIDENCE):
+        self.conn = conn
+        self.min_count = min_count
+        self.confidence = confidence
+        self.verdicts = {}
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS verdict_stats (
+                level TEXT,
+                key TEXT,
+                events INTEGER,
+                total INTEGER,
+                PRIMARY KEY (level, key)
+            )
+        ''')
+        conn.commit()
+
+    def rebuild(self):
+        """
+        Recounts from labels and from predictions made by the model itself (cascade verdicts
+        would only confirm themselves). A label overrides the prediction for the same email.
+        """
+        rows = self.conn.execute('''
+            SELECT e.sender, e.list_id, e.subject, COALESCE(l.is_event, p.is_event)
+            FROM emails e
+            LEFT JOIN labels l ON l.email_id = e.id
+            LEFT JOIN predictions p ON p.email_id = e.id AND (p.source IS NULL OR p.source = 'model')
+            WHERE l.email_id IS NOT NULL OR p.email_id IS NOT NULL
+        ''')
+        counts = {}
+        for sender, list_id, subject, is_event in rows:
+            for level, key in keys_for(sender, list_id, subject).items():
+                if key:
+                    events, total = counts.get((level, key), (0, 0))
+                    counts[(level, key)] = (events + is_event, total + 1)
+
+        with self.conn:
+            self.conn.execute("DELETE FROM verdict_stats")
+            self.conn.executemany("INSERT INTO verdict_stats (level, key, events, total) VALUES (?, ?, ?, ?)",
+                                  [(level, key, events, total) for (level, key), (events, total) in counts.items()])
+        self.load()
+
+    def load(self):
+        self.verdicts = {}
+        for level, key, events, total in self.conn.execute("SELECT level, key, events, total FROM verdict_stats"):
+            if total < self.min_count:
+                continue
+            # Laplace smoothing, so a handful of agreeing emails isn't certainty
+            rate = (events + 1) / (total + 2)
+            if rate >= self.confidence:
+                self.verdicts[(level, key)] = 1
+            elif rate <= 1 - self.confidence:
+                self.verdicts[(level, key)] = 0
+
+    def verdict(self, sender, list_id, subject):
+        """Returns (level, is_event) from the first confident level, or None to ask the model."""
+        keys = keys_for(sender, list_id, subject)
+        for level in LEVELS:
+            is_event = self.verdicts.get((level, keys[level]))
+            if is_event is not None:
+                return level, is_event
+        return None
+
+def main():
+    import email_store
+
+    arg_parser = argparse.ArgumentParser(description="Rebuild per-list / per-sender event rates and list the confident ones.")
+    arg_parser.add_argument("--db", default=email_store.DB_NAME)
+    arg_parser.add_argument("--min-count", type=int, default=MIN_COUNT)
+    arg_parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    args = arg_parser.parse_args()
+
+    conn = email_store.connect(args.db)
+    cache = VerdictCache(conn, args.min_count, args.confidence)
+    cache.rebuild()
+    stats = {(level, key): (events, total) for level, key, events, total in
+             conn.execute("SELECT level, key, events, total FROM verdict_stats")}
+    conn.close()
+
+    print(f"{len(stats)} keys, {len(cache.verdicts)} confident:")
+    for (level, key), is_event in sorted(cache.verdicts.items()):
+        events, total = stats[(level, key)]
+        print(f"  {level:6} {'event' if is_event else 'not an event':12} {events}/{total}  {key}")
+
+if __name__ == "__main__":
+    main()